@@ -0,0 +1,299 @@
+"""
+Async (ASGI) execution mode for the Veramo backend.
+
+Serves the same routes as app/main.py, but every request waits on fal uploads,
+the fal queue and CDN downloads on one event loop instead of holding a thread.
+CPU-bound Pillow work runs in the default executor.
+
+Run with:  uvicorn app.asgi:asgi_app --host 0.0.0.0 --port $PORT
+"""
+from quart import Quart, Response, request, jsonify
+from quart_cors import cors
+from datetime import datetime
+from PIL import Image
+import asyncio
+import base64
+import io
+import traceback
+
+import httpx
+
+from app.fal_helpers import configure_fal, upload_bytes_to_fal_async
+from app.image_routing import allowed_file, build_image_request
+from app.workflows import WORKFLOWS, WorkflowInputError, get_workflow, run_workflow_async
+from app.idempotency import idempotent_async
+from app.scheduler import (INTERACTIVE, LONG_RUNNING, SchedulerBusy, busy_response,
+                           requester_async, scheduled_async, scheduler)
+from app.workflow_routes import (is_remote_url, podcast_arguments, podcast_payload, short_animation_payload,
+                                 short_animation_request, video_arguments, video_with_audio_payload,
+                                 video_with_audio_request)
+from app.supabase_rest import access_token_from
+from app.widget_feed import WidgetFeedError, commit_share_from_json, feed_response, get_payload
+from app.fal_stub import fal_stub_enabled, install_fal_stub
+from app.tracing import init_quart_tracing, process_stats
+
+asgi_app = cors(Quart(__name__), allow_origin="*")
+init_quart_tracing(asgi_app)
+
+# One pooled HTTP client per instance for CDN downloads
+http_client = None
+
+
+@asgi_app.before_serving
+async def _open_http_client():
+    global http_client
+    http_client = httpx.AsyncClient(timeout=30, follow_redirects=True)
+
+
+@asgi_app.after_serving
+async def _close_http_client():
+    await http_client.aclose()
+
+
+def _render_png(image_bytes):
+    """Decode model output and re-encode it as PNG (CPU-bound, runs in the executor)"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        output = io.BytesIO()
+        img.save(output, 'PNG')
+        return output.getvalue()
+
+
+async def _fetch_bytes(url):
+    response = await http_client.get(url)
+    response.raise_for_status()
+    return response.content
+
+
+async def load_generated_image_png(image_url):
+    """Async counterpart of main.load_generated_image that returns PNG bytes"""
+    url_str = str(image_url).strip()
+    if url_str.startswith('data:image/'):
+        print("🖼️ Found base64 data URL, decoding directly")
+        header, data = url_str.split(',', 1)
+        image_bytes = base64.b64decode(data)
+    elif url_str.startswith('http'):
+        image_bytes = await _fetch_bytes(url_str)
+    else:
+        raise RuntimeError("Invalid image URL returned by model")
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _render_png, image_bytes)
+
+
+if fal_stub_enabled():
+    install_fal_stub()
+
+    @asgi_app.route('/debug/stats', methods=['GET'])
+    async def debug_stats():
+        return jsonify(process_stats())
+
+
+@asgi_app.route('/', methods=['GET'])
+async def root():
+    return jsonify({
+        "message": "Veramo Backend API is running!",
+        "version": "1.0.0",
+        "mode": "asgi",
+        "endpoints": {
+            "health": "/health",
+            "generate": "/generate-image",
+            "podcast": "/generate-podcast",
+            "short_animation": "/generate-short-animation",
+            "video_with_audio": "/generate-video-with-audio",
+            "workflows": "/workflows",
+            "widget_feed": "/widget-feed/<couple_id>"
+        }
+    })
+
+
+@asgi_app.route('/health', methods=['GET'])
+async def health():
+    return jsonify({
+        "status": "OK",
+        "timestamp": datetime.utcnow().isoformat(),
+        "service": "Veramo API",
+        "version": "1.0.0",
+        "lanes": scheduler.stats()
+    })
+
+
+@asgi_app.route('/generate-image', methods=['POST'])
+@idempotent_async
+@scheduled_async(INTERACTIVE)
+async def generate_image():
+    try:
+        form = await request.form
+        files = await request.files
+        description = form.get('description', '')
+        style_label = form.get('style_label', 'neutral')
+
+        if not description.strip():
+            return jsonify({"error": "Description is required"}), 400
+        if not configure_fal():
+            raise RuntimeError("FAL_KEY not set")
+
+        # Upload up to 5 references to fal concurrently, straight from memory
+        uploads = [
+            upload_bytes_to_fal_async(file.read(), file.mimetype or 'image/jpeg')
+            for file in files.getlist('images')[:5]
+            if file and file.filename and allowed_file(file.filename)
+        ]
+        image_urls = list(await asyncio.gather(*uploads))
+        print(f"📋 Total image URLs: {len(image_urls)}")
+
+        workflow_name, arguments = build_image_request(description, style_label, image_urls)
+        outputs, result = await run_workflow_async(workflow_name, arguments)
+        if not outputs['image_url']:
+            print(f"❌ No image URL found in result: {result}")
+            raise RuntimeError("No image URL found in model result")
+
+        png_bytes = await load_generated_image_png(outputs['image_url'])
+        return Response(png_bytes, mimetype='image/png', headers={
+            "Content-Disposition": "attachment; filename=generated_image.png"
+        })
+
+    except Exception as e:
+        print(f"❌ fal.ai error: {e}")
+        print(f"❌ Full traceback: {traceback.format_exc()}")
+        return jsonify({"error": f"Image generation failed: {str(e)}"}), 500
+
+
+@asgi_app.route('/workflows', methods=['GET'])
+async def list_workflows():
+    return jsonify({name: workflow.describe() for name, workflow in WORKFLOWS.items()})
+
+
+@asgi_app.route('/workflows/<name>', methods=['POST'])
+async def generic_workflow(name):
+    try:
+        workflow = get_workflow(name)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+
+    user, weight = await requester_async(request)
+    try:
+        async with scheduler.slot_async(workflow.lane, user, weight):
+            outputs, _ = await run_workflow_async(name, await request.get_json(silent=True) or {})
+        return jsonify({"outputs": outputs, "error": None})
+    except SchedulerBusy as e:
+        return busy_response(jsonify, e)
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Workflow {name} failed: {str(e)}"}), 500
+
+
+@asgi_app.route('/generate-podcast', methods=['POST'])
+@idempotent_async
+@scheduled_async(LONG_RUNNING)
+async def generate_podcast():
+    try:
+        if not configure_fal():
+            return jsonify({"error": "FAL_KEY not set"}), 500
+
+        arguments = podcast_arguments(await request.get_json(silent=True))
+        outputs, _ = await run_workflow_async('couplepodcast', arguments)
+        payload = podcast_payload(outputs)
+        if not payload:
+            return jsonify({"error": "Failed to generate audio or retrieve URL from Fal workflow"}), 500
+        return jsonify(payload)
+
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Podcast generation failed: {str(e)}"}), 500
+
+
+@asgi_app.route('/generate-short-animation', methods=['POST'])
+@idempotent_async
+@scheduled_async(LONG_RUNNING)
+async def generate_short_animation():
+    try:
+        if not configure_fal():
+            return jsonify({"error": "FAL_KEY not set"}), 500
+
+        multipart = bool(request.content_type and request.content_type.startswith('multipart/form-data'))
+        form = await request.form
+        image_file = (await request.files).get('image')
+        data = None if multipart else await request.get_json(silent=True)
+        description, duration, image_url = short_animation_request(multipart, form, data, image_file)
+
+        if image_url is None:
+            image_url = await upload_bytes_to_fal_async(image_file.read(), image_file.mimetype or 'application/octet-stream')
+        elif is_remote_url(image_url):
+            # Re-host remote URLs on fal so the workflow can always reach them
+            image_url = await upload_bytes_to_fal_async(await _fetch_bytes(image_url))
+
+        outputs, result = await run_workflow_async('short-couple-video', video_arguments(description, image_url, duration))
+
+        payload = short_animation_payload(outputs)
+        if not payload:
+            return jsonify({"error": "Failed to retrieve video URL from workflow result", "raw": result}), 502
+        return jsonify(payload)
+
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error generating short animation: {e}")
+        return jsonify({"error": f"Short animation generation failed: {str(e)}"}), 500
+
+
+@asgi_app.route('/generate-video-with-audio', methods=['POST'])
+@idempotent_async
+@scheduled_async(LONG_RUNNING)
+async def generate_video_with_audio():
+    try:
+        if not configure_fal():
+            return jsonify({"error": "FAL_KEY not set"}), 500
+
+        form = await request.form
+        files = await request.files
+        data = await request.get_json(silent=True) if request.is_json else None
+        description, duration, image_url = video_with_audio_request(form, data)
+
+        image_file = files.get('image')
+        if image_file and image_file.filename:
+            image_url = await upload_bytes_to_fal_async(image_file.read(), image_file.mimetype or 'application/octet-stream')
+
+        outputs, _ = await run_workflow_async('short-couple-video-audio', video_arguments(description, image_url, duration))
+
+        payload = video_with_audio_payload(outputs)
+        if not payload:
+            return jsonify({"error": "Failed to generate video or missing URL in response"}), 500
+        return jsonify(payload)
+
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Video with audio generation failed: {str(e)}"}), 500
+
+
+@asgi_app.route('/widget-feed/<couple_id>', methods=['GET'])
+async def widget_feed(couple_id):
+    # Authorization and cache-miss hydration call Supabase; keep them off the loop
+    loop = asyncio.get_running_loop()
+    try:
+        payload = await loop.run_in_executor(None, get_payload, couple_id, access_token_from(request.headers),
+                                             request.args.get('tz'))
+    except WidgetFeedError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Widget feed failed: {str(e)}"}), 500
+
+    if request.if_none_match.contains_weak(payload['etag']):
+        return feed_response(Response, payload, status=304)
+    return feed_response(Response, payload)
+
+
+@asgi_app.route('/widget-feed/<couple_id>/shares', methods=['POST'])
+async def commit_widget_share(couple_id):
+    loop = asyncio.get_running_loop()
+    try:
+        data = await request.get_json(silent=True)
+        payload = await loop.run_in_executor(None, commit_share_from_json, couple_id, data,
+                                             access_token_from(request.headers))
+        return feed_response(Response, payload)
+    except WidgetFeedError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Widget share commit failed: {str(e)}"}), 500
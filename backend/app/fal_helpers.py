@@ -0,0 +1,68 @@
+import os
+import tempfile
+import traceback
+
+import fal_client
+
+# Shared fal.ai plumbing used by every workflow handler
+
+
+def configure_fal():
+    """Load FAL_KEY into the fal client. Returns True if a key is configured."""
+    fal_client.api_key = os.getenv('FAL_KEY')
+    return bool(fal_client.api_key)
+
+
+def _normalize_upload_result(upload_result):
+    """fal upload helpers return either a URL string or a dict with a 'url' key"""
+    if isinstance(upload_result, dict) and 'url' in upload_result:
+        return upload_result['url']
+    if isinstance(upload_result, str):
+        return upload_result
+    raise Exception(f"Unexpected upload result format: {type(upload_result)}")
+
+
+def upload_to_fal(path):
+    """Upload a local file to fal storage and return its hosted URL"""
+    upload_methods = [
+        ("upload_file", lambda: fal_client.upload_file(path)),
+        ("storage.upload", lambda: fal_client.storage.upload(path)),
+        ("upload", lambda: fal_client.upload(path)),
+    ]
+    for method_name, upload in upload_methods:
+        try:
+            upload_result = upload()
+        except Exception as e:
+            print(f"📤 Upload via {method_name} failed: {e}")
+            continue
+        if upload_result:
+            url = _normalize_upload_result(upload_result)
+            print(f"✅ Uploaded {path} via {method_name}: {url}")
+            return url
+
+    print(f"❌ Upload error traceback: {traceback.format_exc()}")
+    raise Exception("All upload methods failed")
+
+
+def upload_bytes_to_fal(data, suffix=".bin"):
+    """Upload in-memory bytes to fal storage and return the hosted URL"""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        tmp.write(data)
+        tmp_path = tmp.name
+    try:
+        return upload_to_fal(tmp_path)
+    finally:
+        try:
+            os.remove(tmp_path)
+        except Exception:
+            pass
+
+
+async def upload_to_fal_async(path):
+    """Async variant of upload_to_fal for the ASGI service"""
+    return _normalize_upload_result(await fal_client.upload_file_async(path))
+
+
+async def upload_bytes_to_fal_async(data, content_type='application/octet-stream'):
+    """Upload in-memory bytes to fal storage without touching the filesystem"""
+    return _normalize_upload_result(await fal_client.upload_async(data, content_type))
@@ -0,0 +1,100 @@
+import asyncio
+import base64
+import io
+import os
+import time
+
+import fal_client
+from PIL import Image
+
+# fal stand-in for local load testing and trace replay. Enabled with
+# VERAMO_FAL_STUB=1: fal uploads and queue submissions are answered locally
+# after a simulated inference delay, so replays exercise our own request path
+# (parsing, uploads, Pillow work, response building) without calling fal.
+
+# Simulated inference time per application in seconds, divided by VERAMO_FAL_STUB_SPEEDUP
+STUB_LATENCY = {
+    'workflows/odtboun/couplepodcast': 40.0,
+    'workflows/odtboun/short-couple-video': 90.0,
+    'workflows/odtboun/short-couple-video-audio': 120.0,
+}
+DEFAULT_IMAGE_LATENCY = 8.0
+
+
+def fal_stub_enabled():
+    return os.getenv('VERAMO_FAL_STUB', '').lower() in ('1', 'true', 'yes')
+
+
+def _latency(application):
+    speedup = float(os.getenv('VERAMO_FAL_STUB_SPEEDUP', '1') or 1)
+    return STUB_LATENCY.get(application, DEFAULT_IMAGE_LATENCY) / max(speedup, 1e-6)
+
+
+def _stub_image_data_url(size=1024):
+    img = Image.new('RGB', (size, size), (128, 96, 160))
+    buffer = io.BytesIO()
+    img.save(buffer, 'JPEG', quality=85)
+    return 'data:image/jpeg;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+_STUB_IMAGE_URL = None
+
+
+def _stub_result(application):
+    global _STUB_IMAGE_URL
+    if application.endswith('couplepodcast'):
+        return {"audio": {"url": "https://stub.fal.local/podcast.mp3"}, "duration": 42.0}
+    if application.startswith('workflows/'):
+        return {"video": {"url": "https://stub.fal.local/video.mp4", "content_type": "video/mp4",
+                          "file_name": "video.mp4"}}
+    if _STUB_IMAGE_URL is None:
+        _STUB_IMAGE_URL = _stub_image_data_url()
+    return {"images": [{"url": _STUB_IMAGE_URL}]}
+
+
+class _StubHandle:
+    def __init__(self, application):
+        self.application = application
+
+    def get(self):
+        time.sleep(_latency(self.application))
+        return _stub_result(self.application)
+
+
+class _AsyncStubHandle(_StubHandle):
+    async def get(self):
+        await asyncio.sleep(_latency(self.application))
+        return _stub_result(self.application)
+
+
+def _stub_upload_file(path):
+    return f"https://stub.fal.local/uploads/{os.path.basename(str(path))}"
+
+
+def _stub_upload(data, content_type='application/octet-stream'):
+    return f"https://stub.fal.local/uploads/{len(data)}"
+
+
+async def _stub_upload_file_async(path):
+    return _stub_upload_file(path)
+
+
+async def _stub_upload_async(data, content_type='application/octet-stream'):
+    return _stub_upload(data, content_type)
+
+
+async def _stub_submit_async(application, arguments, **kwargs):
+    return _AsyncStubHandle(application)
+
+
+def install_fal_stub():
+    """Replace the fal client entry points used by the backend with local stand-ins"""
+    fal_client.submit = lambda application, arguments, **kwargs: _StubHandle(application)
+    fal_client.run = lambda application, arguments, **kwargs: _StubHandle(application).get()
+    fal_client.submit_async = _stub_submit_async
+    fal_client.upload_file = _stub_upload_file
+    fal_client.upload = _stub_upload
+    fal_client.upload_file_async = _stub_upload_file_async
+    fal_client.upload_async = _stub_upload_async
+    os.environ.setdefault('FAL_KEY', 'stub')
+    print("🧪 fal stand-in enabled: no requests will reach fal.ai")
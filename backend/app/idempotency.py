@@ -0,0 +1,475 @@
+import asyncio
+import hashlib
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+# Idempotency-Key support for the generation endpoints. The first request with a
+# key runs the job; retries with the same key either wait for that job and get its
+# response, or get the stored response straight away, so client retries on
+# timeouts never start a second fal job. Keys are scoped to the endpoint (and to
+# the Supabase user when the request carries a verified token), not to the
+# client's address, so a retry from another network still matches. Each entry
+# stores a fingerprint of the request; reusing a key for a different request is
+# rejected with 422 instead of replaying the other response.
+#
+# A claim belongs to the request that made it: begin() hands out an owner token
+# that completing or releasing the claim must present, and a heartbeat refreshes
+# the claim while the job runs. Only a claim whose owner stopped beating (a crashed
+# worker) goes stale and can be taken over, and if that ever happens the original
+# job can no longer overwrite or delete the new owner's claim.
+#
+# State lives in a local SQLite file so it survives worker restarts and is shared
+# by all workers on the instance. On Cloud Run /tmp is an in-memory filesystem
+# that counts against the instance's memory limit (512Mi for these services), so
+# the store is capped by row count and total body bytes, oldest entries are
+# evicted first, and image responses (the large ones) are kept for a short TTL
+# only. Point VERAMO_IDEMPOTENCY_DB at a mounted volume to keep more.
+
+IDEMPOTENCY_DB = os.getenv('VERAMO_IDEMPOTENCY_DB', '/tmp/veramo_idempotency.sqlite3')
+RESPONSE_TTL = int(os.getenv('VERAMO_IDEMPOTENCY_TTL', 24 * 3600))
+IMAGE_RESPONSE_TTL = int(os.getenv('VERAMO_IDEMPOTENCY_IMAGE_TTL', 15 * 60))
+MAX_ROWS = int(os.getenv('VERAMO_IDEMPOTENCY_MAX_ROWS', 2000))
+MAX_STORE_BYTES = int(os.getenv('VERAMO_IDEMPOTENCY_MAX_BYTES', 64 * 1024 * 1024))
+MAX_BODY_BYTES = int(os.getenv('VERAMO_IDEMPOTENCY_MAX_BODY_BYTES', 8 * 1024 * 1024))
+# An in-progress entry older than this is treated as orphaned (e.g. a crashed worker)
+STALE_AFTER = int(os.getenv('VERAMO_IDEMPOTENCY_STALE_AFTER', 15 * 60))
+# Running jobs refresh their claim this often, well inside STALE_AFTER
+HEARTBEAT_INTERVAL = STALE_AFTER / 5
+MAX_ATTACH_WAIT = int(os.getenv('VERAMO_IDEMPOTENCY_MAX_WAIT', 10 * 60))
+CLEANUP_INTERVAL = 60
+POLL_INTERVAL = 0.25
+MAX_KEY_LENGTH = 255
+
+NEW = 'new'
+IN_PROGRESS = 'in_progress'
+COMPLETED = 'completed'
+MISMATCH = 'mismatch'
+
+_local_done = {}          # store key -> threading.Event, wakes same-process Flask waiters early
+_local_done_lock = threading.Lock()
+_local_jobs = {}          # store key -> asyncio.Task running the job in this process (ASGI mode)
+_connections = threading.local()
+_last_cleanup = 0.0
+
+# The ASGI app runs every store call on this one thread, off the event loop
+_store_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='idempotency-store')
+
+
+def _connect():
+    """Per-thread connection, reopened if the database path changes"""
+    conn = getattr(_connections, 'conn', None)
+    if conn is not None and _connections.path == IDEMPOTENCY_DB:
+        return conn
+    conn = sqlite3.connect(IDEMPOTENCY_DB, timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_records (
+            key TEXT PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            state TEXT NOT NULL,
+            status INTEGER,
+            mimetype TEXT,
+            headers TEXT,
+            body BLOB,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            owner TEXT
+        )
+    """)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(idempotency_records)")]
+    if 'owner' not in columns:
+        # Stores created before claims had owners (e.g. on a mounted volume)
+        conn.execute("ALTER TABLE idempotency_records ADD COLUMN owner TEXT")
+    _connections.conn = conn
+    _connections.path = IDEMPOTENCY_DB
+    return conn
+
+
+def store_key(path, scope, idempotency_key):
+    """Scope a client key to the endpoint (and verified user, if any) so keys cannot collide across them"""
+    return hashlib.sha256(f"{path}|{scope or ''}|{idempotency_key}".encode('utf-8')).hexdigest()
+
+
+def request_fingerprint(method, path, form, files, data, raw):
+    """
+    Hash of what a request asks for, stable across retries. Multipart bodies are hashed
+    by field and file content rather than raw bytes, since the boundary changes per send.
+    """
+    digest = hashlib.sha256(f"{method} {path}\n".encode('utf-8'))
+    if form or files:
+        for name, value in sorted(form.items(multi=True)):
+            digest.update(f"f:{name}={value}\n".encode('utf-8'))
+        for name, file in sorted(files.items(multi=True), key=lambda item: (item[0], item[1].filename or '')):
+            digest.update(f"u:{name}={file.filename}\n".encode('utf-8'))
+            stream = file.stream
+            stream.seek(0)
+            for chunk in iter(lambda: stream.read(65536), b''):
+                digest.update(chunk)
+            stream.seek(0)
+    elif data is not None:
+        digest.update(json.dumps(data, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+    else:
+        digest.update(raw or b'')
+    return digest.hexdigest()
+
+
+_ROW_COLUMNS = "fingerprint, state, updated_at, status, mimetype, headers, body, expires_at"
+
+
+def _record(row):
+    return {"status": row[3], "mimetype": row[4], "headers": json.loads(row[5] or '{}'), "body": row[6]}
+
+
+def _classify(row, fingerprint, now):
+    """State of an existing row for this request, or None if the key is free to claim"""
+    if row is None or row[7] <= now:
+        return None
+    if row[1] == IN_PROGRESS and row[2] < now - STALE_AFTER:
+        return None
+    if row[0] != fingerprint:
+        return MISMATCH
+    return row[1]
+
+
+def lookup(key, fingerprint):
+    """
+    Read-only check used while waiting: (COMPLETED, record), (IN_PROGRESS, None),
+    (MISMATCH, None), or (None, None) if the key is free (absent, expired or stale).
+    """
+    row = _connect().execute(
+        f"SELECT {_ROW_COLUMNS} FROM idempotency_records WHERE key = ?", (key,)
+    ).fetchone()
+    state = _classify(row, fingerprint, time.time())
+    return state, (_record(row) if state == COMPLETED else None)
+
+
+def begin(key, fingerprint):
+    """
+    Claim a key. Returns (NEW, owner) if the caller now owns the job, where owner is the
+    token to pass to heartbeat, complete and abandon; (COMPLETED, record) if a stored
+    response exists; (IN_PROGRESS, None) if another request is running it; or
+    (MISMATCH, None) if the key was used for a different request.
+    """
+    now = time.time()
+    owner = secrets.token_hex(16)
+    conn = _connect()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            f"SELECT {_ROW_COLUMNS} FROM idempotency_records WHERE key = ?", (key,)
+        ).fetchone()
+        state = _classify(row, fingerprint, now)
+        if state is None:
+            conn.execute(
+                "INSERT OR REPLACE INTO idempotency_records "
+                "(key, fingerprint, state, created_at, updated_at, expires_at, owner) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, fingerprint, IN_PROGRESS, now, now, now + RESPONSE_TTL, owner)
+            )
+    finally:
+        conn.execute("COMMIT")
+
+    if state is None:
+        with _local_done_lock:
+            _local_done[key] = threading.Event()
+        return NEW, owner
+    return state, (_record(row) if state == COMPLETED else None)
+
+
+def claim_or_attach(key, fingerprint):
+    """Read first and only take the write lock when the key looks free"""
+    state, record = lookup(key, fingerprint)
+    if state is not None:
+        return state, record
+    return begin(key, fingerprint)
+
+
+def _finish(key):
+    with _local_done_lock:
+        event = _local_done.pop(key, None)
+    if event:
+        event.set()
+
+
+def _enforce_limits(conn, now):
+    """Drop expired entries, then evict the oldest completed ones beyond the row and byte caps"""
+    global _last_cleanup
+    if now - _last_cleanup >= CLEANUP_INTERVAL:
+        _last_cleanup = now
+        conn.execute("DELETE FROM idempotency_records WHERE expires_at <= ?", (now,))
+
+    rows, total_bytes = conn.execute(
+        "SELECT COUNT(*), COALESCE(SUM(LENGTH(body)), 0) FROM idempotency_records"
+    ).fetchone()
+    if rows <= MAX_ROWS and total_bytes <= MAX_STORE_BYTES:
+        return
+    evict = []
+    for key, size in conn.execute(
+        "SELECT key, COALESCE(LENGTH(body), 0) FROM idempotency_records WHERE state = ? ORDER BY updated_at",
+        (COMPLETED,)
+    ).fetchall():
+        if rows <= MAX_ROWS and total_bytes <= MAX_STORE_BYTES:
+            break
+        evict.append((key,))
+        rows -= 1
+        total_bytes -= size
+    conn.executemany("DELETE FROM idempotency_records WHERE key = ?", evict)
+    print(f"🧹 Evicted {len(evict)} idempotency records to stay under the store limits")
+
+
+def heartbeat(key, owner):
+    """Mark a running job as alive. Returns False once the claim is no longer the caller's."""
+    cursor = _connect().execute(
+        "UPDATE idempotency_records SET updated_at = ? WHERE key = ? AND owner = ? AND state = ?",
+        (time.time(), key, owner, IN_PROGRESS)
+    )
+    return cursor.rowcount > 0
+
+
+class _Heartbeat(threading.Thread):
+    """Refreshes a claim in the background while a Flask view runs the job"""
+
+    def __init__(self, key, owner):
+        super().__init__(name='idempotency-heartbeat', daemon=True)
+        self.key = key
+        self.owner = owner
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(HEARTBEAT_INTERVAL):
+            try:
+                if not heartbeat(self.key, self.owner):
+                    return
+            except Exception as e:
+                print(f"⚠️ Idempotency heartbeat failed: {e}")
+
+    def stop(self):
+        self.stopped.set()
+
+
+async def _heartbeat_async(key, owner):
+    """Refreshes a claim while an ASGI job task runs; cancelled when the job ends"""
+    while True:
+        await asyncio.sleep(HEARTBEAT_INTERVAL)
+        try:
+            if not await _in_store_thread(heartbeat, key, owner):
+                return
+        except Exception as e:
+            print(f"⚠️ Idempotency heartbeat failed: {e}")
+
+
+def _delete_claim(key, owner):
+    _connect().execute("DELETE FROM idempotency_records WHERE key = ? AND owner = ? AND state = ?",
+                       (key, owner, IN_PROGRESS))
+
+
+def complete(key, owner, status, mimetype, headers, body):
+    """Store the response for a finished job (image bodies expire after IMAGE_RESPONSE_TTL)"""
+    try:
+        if len(body) > MAX_BODY_BYTES:
+            # Too large to keep on this instance; let a retry run the job again
+            print(f"⚠️ Response too large to store for its Idempotency-Key ({len(body)} bytes)")
+            _delete_claim(key, owner)
+            return
+        now = time.time()
+        ttl = IMAGE_RESPONSE_TTL if (mimetype or '').startswith('image/') else RESPONSE_TTL
+        conn = _connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            stored = conn.execute(
+                "UPDATE idempotency_records SET state = ?, status = ?, mimetype = ?, headers = ?, body = ?, "
+                "updated_at = ?, expires_at = ? WHERE key = ? AND owner = ? AND state = ?",
+                (COMPLETED, status, mimetype, json.dumps(headers), body, now, now + ttl, key, owner, IN_PROGRESS)
+            ).rowcount
+            if stored:
+                _enforce_limits(conn, now)
+            else:
+                print("⚠️ Idempotency claim was taken over before the job finished; response not stored")
+        finally:
+            conn.execute("COMMIT")
+    finally:
+        _finish(key)
+
+
+def abandon(key, owner):
+    """Drop the claim on a failed job so the next retry runs it again"""
+    try:
+        _delete_claim(key, owner)
+    finally:
+        _finish(key)
+
+
+def _should_store(status):
+    # Only successful jobs are replayed; validation errors and server-side failures
+    # (including 503 from a saturated lane) stay retryable under the same key
+    return 200 <= status < 300
+
+
+def _stored_headers(response):
+    headers = {}
+    for name in ('Content-Disposition', 'Cache-Control'):
+        if name in response.headers:
+            headers[name] = response.headers[name]
+    return headers
+
+
+def _validate_header(value):
+    if len(value) > MAX_KEY_LENGTH:
+        raise ValueError(f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters")
+
+
+MISMATCH_ERROR = "Idempotency-Key was already used for a different request"
+IN_PROGRESS_ERROR = "Request with this Idempotency-Key is still in progress"
+
+
+def idempotent(view):
+    """Honor the Idempotency-Key header on a Flask view"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from flask import Response, jsonify, make_response, request
+        from app.scheduler import verified_user_id
+
+        client_key = (request.headers.get('Idempotency-Key') or '').strip()
+        if not client_key:
+            return view(*args, **kwargs)
+        try:
+            _validate_header(client_key)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        key = store_key(request.path, verified_user_id(request), client_key)
+        data = request.get_json(silent=True) if request.is_json else None
+        fingerprint = request_fingerprint(request.method, request.path, request.form, request.files,
+                                          data, request.get_data())
+        deadline = time.time() + MAX_ATTACH_WAIT
+        while True:
+            state, record = claim_or_attach(key, fingerprint)
+            if state == NEW:
+                owner = record
+                break
+            if state == MISMATCH:
+                return jsonify({"error": MISMATCH_ERROR}), 422
+            if state == COMPLETED:
+                response = Response(record['body'], status=record['status'], mimetype=record['mimetype'],
+                                    headers=record['headers'])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            if time.time() > deadline:
+                return jsonify({"error": IN_PROGRESS_ERROR}), 409
+            # Attach to the running job: wake early if it finishes in this process, else poll
+            with _local_done_lock:
+                event = _local_done.get(key)
+            if event:
+                event.wait(max(deadline - time.time(), 0))
+            else:
+                time.sleep(POLL_INTERVAL)
+
+        beat = _Heartbeat(key, owner)
+        beat.start()
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            abandon(key, owner)
+            raise
+        finally:
+            beat.stop()
+        if not _should_store(response.status_code):
+            abandon(key, owner)
+            return response
+        # send_file responses stream from disk; buffer them so they can be stored
+        response.direct_passthrough = False
+        complete(key, owner, response.status_code, response.mimetype, _stored_headers(response),
+                 response.get_data())
+        return response
+    return wrapper
+
+
+async def _in_store_thread(fn, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_store_executor, fn, *args)
+
+
+def _forget_job(key):
+    def done(task):
+        _local_jobs.pop(key, None)
+        if not task.cancelled():
+            # Retrieve the outcome so a failure nobody awaited any more is not logged as unhandled
+            task.exception()
+    return done
+
+
+def idempotent_async(view):
+    """
+    Honor the Idempotency-Key header on a Quart view. The job runs in its own task
+    that stores or abandons the claim itself, so a client disconnect (which cancels
+    the handler) leaves the job running and the retry attaches to it.
+    """
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        from quart import Response, copy_current_request_context, jsonify, make_response, request
+        from app.scheduler import verified_user_id_async
+
+        client_key = (request.headers.get('Idempotency-Key') or '').strip()
+        if not client_key:
+            return await view(*args, **kwargs)
+        try:
+            _validate_header(client_key)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        key = store_key(request.path, await verified_user_id_async(request), client_key)
+        data = await request.get_json(silent=True) if request.is_json else None
+        fingerprint = request_fingerprint(request.method, request.path, await request.form, await request.files,
+                                          data, await request.get_data())
+        deadline = time.time() + MAX_ATTACH_WAIT
+        while True:
+            state, record = await _in_store_thread(claim_or_attach, key, fingerprint)
+            if state == NEW:
+                owner = record
+                break
+            if state == MISMATCH:
+                return jsonify({"error": MISMATCH_ERROR}), 422
+            if state == COMPLETED:
+                response = Response(record['body'], status=record['status'], mimetype=record['mimetype'],
+                                    headers=record['headers'])
+                response.headers['Idempotent-Replayed'] = 'true'
+                return response
+            if time.time() > deadline:
+                return jsonify({"error": IN_PROGRESS_ERROR}), 409
+            # Attach to the running job: wait on its task if it runs in this process, else poll
+            job = _local_jobs.get(key)
+            if job is not None:
+                await asyncio.wait([job], timeout=max(deadline - time.time(), 0))
+            else:
+                await asyncio.sleep(POLL_INTERVAL)
+
+        @copy_current_request_context
+        async def run_job():
+            beat = asyncio.ensure_future(_heartbeat_async(key, owner))
+            try:
+                response = await make_response(await view(*args, **kwargs))
+                if not _should_store(response.status_code):
+                    await _in_store_thread(abandon, key, owner)
+                    return response
+                body = await response.get_data()
+                await _in_store_thread(complete, key, owner, response.status_code, response.mimetype,
+                                       _stored_headers(response), body)
+                return response
+            except BaseException:
+                # Not awaited: the store thread releases the claim even while this task is torn down
+                _store_executor.submit(abandon, key, owner)
+                raise
+            finally:
+                beat.cancel()
+
+        job = asyncio.ensure_future(run_job())
+        _local_jobs[key] = job
+        job.add_done_callback(_forget_job(key))
+        return await asyncio.shield(job)
+    return wrapper
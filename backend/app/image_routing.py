@@ -0,0 +1,45 @@
+# Image request routing shared by the Flask app (app/main.py) and the ASGI app
+# (app/asgi.py). Kept free of app setup so either can import it on its own.
+
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
+
+# Styles that FLUX Kontext renders better than Gemini
+FLUX_STYLES = {"claymotion", "fantasy illustration", "gothic victorian", "steampunk"}
+
+
+def allowed_file(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def select_image_workflow(image_count, style_label):
+    """Pick the registered image workflow for a request"""
+    style_normalized = (style_label or "").strip().lower()
+    if image_count >= 1:
+        # With references: default to Gemini edit
+        # BUT for exactly 1 ref + special flux styles, use FLUX Kontext
+        if image_count == 1 and style_normalized in FLUX_STYLES:
+            return "flux-kontext"
+        return "gemini-edit"
+    # Text-only: prefer FLUX for certain styles, otherwise Gemini text-to-image
+    if style_normalized in FLUX_STYLES:
+        return "flux-kontext-text"
+    return "gemini"
+
+
+def build_image_request(description, style_label, image_urls):
+    """Choose the image workflow and build its arguments from the request inputs"""
+    # Create enhanced prompt with style
+    enhanced_prompt = f"{description} (style: {style_label})"
+    print(f"📝 Enhanced prompt: {enhanced_prompt}")
+
+    workflow_name = select_image_workflow(len(image_urls), style_label)
+    print(f"🧠 Using workflow: {workflow_name} (images attached: {len(image_urls)}, style= '{style_label}')")
+
+    arguments = {"prompt": enhanced_prompt}
+    if workflow_name == "flux-kontext":
+        # Kontext expects a single 'image_url' field, not a list
+        arguments["image_url"] = image_urls[0] if image_urls else None
+    else:
+        # Gemini endpoints accept an array of reference URLs
+        arguments["image_urls"] = image_urls
+    return workflow_name, arguments
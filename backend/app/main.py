@@ -6,27 +6,40 @@ import io
 from datetime import datetime
 from PIL import Image, ImageDraw
 import base64
-import tempfile
-import json
-import fal_client
 import requests
 import traceback
+from app.fal_helpers import configure_fal, upload_to_fal
+from app.workflows import run_workflow
+from app.image_routing import allowed_file, build_image_request
+from app.widget_feed import widget_feed_bp
+from app.workflow_routes import workflows_bp
+from app.fal_stub import fal_stub_enabled, install_fal_stub
+from app.tracing import init_flask_tracing, process_stats
+from app.scheduler import INTERACTIVE, scheduled, scheduler
+from app.idempotency import idempotent
 
 # Initialize Flask app
 app = Flask(__name__)
 CORS(app)  # Enable CORS for mobile app
+app.register_blueprint(widget_feed_bp)
+app.register_blueprint(workflows_bp)
+init_flask_tracing(app)
+
+if fal_stub_enabled():
+    install_fal_stub()
+
+    @app.route('/debug/stats', methods=['GET'])
+    def debug_stats():
+        # Only exposed with the fal stand-in, for tools/replay_trace.py memory sampling
+        return jsonify(process_stats())
 
 # Configuration
 UPLOAD_FOLDER = '/tmp/uploads'
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'bmp'}
 MAX_FILE_SIZE = 16 * 1024 * 1024  # 16MB max file size
 
 # Ensure upload directory exists
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
 def create_solid_color_square(size=512, color=(128, 128, 128)):
     """Create a solid color square image"""
     img = Image.new('RGB', (size, size), color)
@@ -73,229 +86,65 @@ def select_model_and_preprocess(description, images, style_label):
     
     return formatted_inputs
 
+def load_generated_image(image_url):
+    """Turn a model output URL (https or base64 data URL) into a PIL image"""
+    url_str = str(image_url).strip()
+    print(f"🖼️ Generated image URL: {url_str[:200]}")
+
+    # Check if it's a base64 data URL
+    if url_str.startswith('data:image/'):
+        print("🖼️ Found base64 data URL, decoding directly")
+        try:
+            header, data = url_str.split(',', 1)
+            image_data = base64.b64decode(data)
+            print("✅ Successfully decoded base64 image data")
+            return Image.open(io.BytesIO(image_data))
+        except Exception as decode_error:
+            print(f"❌ Base64 decode error: {decode_error}")
+            raise RuntimeError("Failed to decode base64 image data from model output")
+
+    if not url_str.startswith('http'):
+        print(f"❌ Invalid image URL format: {repr(image_url)}")
+        raise RuntimeError("Invalid image URL returned by model")
+
+    try:
+        response = requests.get(url_str, timeout=30)
+    except Exception as download_error:
+        print(f"❌ Download error: {download_error}")
+        raise RuntimeError("Error downloading image from returned URL")
+    print(f"🖼️ Download response status: {response.status_code}")
+    if response.status_code != 200:
+        print(f"❌ Response content: {response.text[:200]}...")
+        raise RuntimeError(f"Image download failed: status {response.status_code}")
+    print("✅ Successfully downloaded generated image")
+    return Image.open(io.BytesIO(response.content))
+
 def generate_with_fal_ai(description, images, style_label):
     """
-    Generate image using fal.ai. Switched to Gemini 2.5 Flash Image.
-    Previously: FLUX Pro Kontext Multi (commented out below).
+    Generate image using fal.ai. Routes to Gemini 2.5 Flash Image or FLUX Kontext
+    depending on reference count and style (see image_routing.select_image_workflow).
     """
     try:
-        # Configure fal.ai client
-        fal_client.api_key = os.getenv('FAL_KEY')
-        print(f"🔑 FAL_KEY set: {bool(os.getenv('FAL_KEY'))}")
-        
+        if not configure_fal():
+            raise RuntimeError("FAL_KEY not set")
+
         # Upload images to fal.ai storage and get URLs
         image_urls = []
         for i, img_path in enumerate(images):
             print(f"📤 Uploading image {i+1}/{len(images)}: {img_path}")
-            try:
-                # Try different upload methods
-                upload_result = None
-                
-                # Method 1: Try fal_client.upload_file()
-                try:
-                    upload_result = fal_client.upload_file(img_path)
-                    print(f"📤 Method 1 (upload_file) result: {upload_result}")
-                except Exception as e:
-                    print(f"📤 Method 1 failed: {e}")
-                
-                # Method 2: Try fal_client.storage.upload()
-                if not upload_result:
-                    try:
-                        upload_result = fal_client.storage.upload(img_path)
-                        print(f"📤 Method 2 (storage.upload) result: {upload_result}")
-                    except Exception as e:
-                        print(f"📤 Method 2 failed: {e}")
-                
-                # Method 3: Try fal_client.upload()
-                if not upload_result:
-                    try:
-                        upload_result = fal_client.upload(img_path)
-                        print(f"📤 Method 3 (upload) result: {upload_result}")
-                    except Exception as e:
-                        print(f"📤 Method 3 failed: {e}")
-                
-                if not upload_result:
-                    raise Exception("All upload methods failed")
-                
-                # Handle different response formats
-                if isinstance(upload_result, dict) and 'url' in upload_result:
-                    image_urls.append(upload_result['url'])
-                    print(f"✅ Image {i+1} uploaded successfully: {upload_result['url']}")
-                elif isinstance(upload_result, str):
-                    # If it's a string, it might be the URL directly
-                    image_urls.append(upload_result)
-                    print(f"✅ Image {i+1} uploaded successfully (string): {upload_result}")
-                else:
-                    print(f"❌ Unexpected upload result format: {upload_result}")
-                    raise Exception(f"Unexpected upload result format: {type(upload_result)}")
-                    
-            except Exception as upload_error:
-                print(f"❌ Upload error for image {i+1}: {upload_error}")
-                print(f"❌ Upload error traceback: {traceback.format_exc()}")
-                raise upload_error
-        
+            image_urls.append(upload_to_fal(img_path))
         print(f"📋 Total image URLs: {len(image_urls)}")
-        
-        # Create enhanced prompt with style
-        enhanced_prompt = f"{description} (style: {style_label})"
-        print(f"📝 Enhanced prompt: {enhanced_prompt}")
-        
-        # Select model based on inputs
-        style_normalized = (style_label or "").strip().lower()
-        flux_styles = {"claymotion", "fantasy illustration", "gothic victorian", "steampunk"}
-        if len(image_urls) >= 1:
-            # With references: default to Gemini edit
-            # BUT for exactly 1 ref + special flux styles, use FLUX Kontext
-            if len(image_urls) == 1 and style_normalized in flux_styles:
-                model_id = "fal-ai/flux-pro/kontext"
-            else:
-                model_id = "fal-ai/gemini-25-flash-image/edit"
-        else:
-            # Text-only: prefer FLUX for certain styles, otherwise Gemini text-to-image
-            if style_normalized in flux_styles:
-                model_id = "fal-ai/flux-pro/kontext/text-to-image"
-            else:
-                model_id = "fal-ai/gemini-25-flash-image"
-        print(f"🧠 Using model: {model_id} (images attached: {len(image_urls)}, style= '{style_normalized}')")
 
-        # Build payload per model requirements
-        if model_id == "fal-ai/flux-pro/kontext":
-            # Kontext expects a single 'image_url' field, not a list
-            payload = {
-                "prompt": enhanced_prompt,
-                "image_url": image_urls[0] if image_urls else None,
-                "sync_mode": False,
-                "output_format": "jpeg",
-                "safety_tolerance": "4",
-                "enhance_prompt": True,
-                "aspect_ratio": "1:1",
-                "num_images": 1
-            }
-        else:
-            # Gemini endpoints accept an array of reference URLs
-            payload = {
-                "prompt": enhanced_prompt,
-                "image_urls": image_urls,
-                "sync_mode": False,
-                "output_format": "jpeg",
-                "safety_tolerance": "4",
-                "enhance_prompt": True,
-                "aspect_ratio": "1:1",
-                "num_images": 1
-            }
+        workflow_name, arguments = build_image_request(description, style_label, image_urls)
+        outputs, result = run_workflow(workflow_name, arguments)
+        if not outputs['image_url']:
+            print(f"❌ No image URL found in result: {result}")
+            raise RuntimeError("No image URL found in model result")
+        return load_generated_image(outputs['image_url'])
 
-        print(f"🚀 Calling fal.ai with payload: {json.dumps(payload, indent=2)}")
-        result_handle = fal_client.submit(model_id, payload)
-        print(f"🎯 fal.ai result handle type: {type(result_handle)}")
-        print(f"🎯 fal.ai result handle: {result_handle}")
-        
-        # Get the actual result from the handle
-        try:
-            result = result_handle.get()
-            print(f"🎯 fal.ai result type: {type(result)}")
-            print(f"🎯 fal.ai result: {result}")
-            
-            # Download the generated image
-            print(f"🔍 Checking result structure...")
-            print(f"🔍 Result keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
-            print(f"🔍 Full result structure: {result}")
-            
-            # Try different possible result formats
-            image_url = None
-            
-            # Format 1: result['data']['images'][0]['url']
-            if result and 'data' in result and 'images' in result['data']:
-                image_url = result['data']['images'][0]['url']
-                print(f"🖼️ Found image URL (format 1): {image_url}")
-            
-            # Format 2: result['images'][0]['url'] (direct images array)
-            elif result and 'images' in result:
-                image_url = result['images'][0]['url']
-                print(f"🖼️ Found image URL (format 2): {image_url}")
-            
-            # Format 3: result['data']['url'] (single image)
-            elif result and 'data' in result and 'url' in result['data']:
-                image_url = result['data']['url']
-                print(f"🖼️ Found image URL (format 3): {image_url}")
-            
-            # Format 4: result['url'] (direct URL)
-            elif result and 'url' in result:
-                image_url = result['url']
-                print(f"🖼️ Found image URL (format 4): {image_url}")
-            
-            if image_url:
-                print(f"🖼️ Generated image URL: {image_url}")
-                print(f"🖼️ Image URL type: {type(image_url)}")
-                print(f"🖼️ Image URL value: {repr(image_url)}")
-                
-                # Validate URL before making request - be more lenient
-                url_str = str(image_url).strip()
-                print(f"🔍 URL validation - original: {repr(image_url)}")
-                print(f"🔍 URL validation - string: {repr(url_str)}")
-                print(f"🔍 URL validation - starts with http: {url_str.startswith('http')}")
-                print(f"🔍 URL validation - starts with data: {url_str.startswith('data:')}")
-                print(f"🔍 URL validation - length: {len(url_str)}")
-                
-                # Check if it's a base64 data URL
-                if url_str.startswith('data:image/'):
-                    print("🖼️ Found base64 data URL, decoding directly")
-                    try:
-                        # Extract base64 data from data URL
-                        header, data = url_str.split(',', 1)
-                        print(f"🔍 Data URL header: {header}")
-                        print(f"🔍 Data length: {len(data)}")
-                        
-                        # Decode base64 data
-                        image_data = base64.b64decode(data)
-                        print("✅ Successfully decoded base64 image data")
-                        return Image.open(io.BytesIO(image_data))
-                    except Exception as decode_error:
-                        print(f"❌ Base64 decode error: {decode_error}")
-                        print("⚠️ Base64 decode failed, falling back to placeholder")
-                        raise RuntimeError("Failed to decode base64 image data from model output")
-                
-                # More lenient URL validation for HTTP URLs - just check if it's a non-empty string
-                elif not url_str or len(url_str) < 10:
-                    print(f"❌ Invalid image URL format: {repr(image_url)}")
-                    print("⚠️ Invalid URL format, falling back to placeholder")
-                    raise RuntimeError("Invalid image URL returned by model")
-                
-                # Try to download the image from HTTP URL
-                print(f"🖼️ Attempting to download image from: {url_str}")
-                try:
-                    response = requests.get(url_str, timeout=30)
-                    print(f"🖼️ Download response status: {response.status_code}")
-                    if response.status_code == 200:
-                        print("✅ Successfully downloaded generated image")
-                        return Image.open(io.BytesIO(response.content))
-                    else:
-                        print(f"❌ Failed to download image: {response.status_code}")
-                        print(f"❌ Response content: {response.text[:200]}...")
-                        print("⚠️ Image download failed, falling back to placeholder")
-                        raise RuntimeError(f"Image download failed: status {response.status_code}")
-                except Exception as download_error:
-                    print(f"❌ Download error: {download_error}")
-                    print("⚠️ Image download failed, falling back to placeholder")
-                    raise RuntimeError("Error downloading image from returned URL")
-            else:
-                print(f"❌ No image URL found in result: {result}")
-                # Fallback to placeholder if result format is unexpected
-                print("⚠️ Unexpected result format, falling back to placeholder")
-                raise RuntimeError("No image URL found in model result")
-        except Exception as e:
-            print(f"❌ Error getting result from fal.ai: {e}")
-            print(f"❌ Error type: {type(e)}")
-            import traceback
-            print(f"❌ Traceback: {traceback.format_exc()}")
-            # Fallback to placeholder if any error occurs
-            print("⚠️ fal.ai error, falling back to placeholder")
-            raise
-        
     except Exception as e:
         print(f"❌ fal.ai error: {e}")
-        import traceback
         print(f"❌ Full traceback: {traceback.format_exc()}")
-        # Fallback to placeholder
         raise
 
 def generate_with_nano_banana(description, style_label):
@@ -303,109 +152,21 @@ def generate_with_nano_banana(description, style_label):
     Generate image using fal.ai nano-banana for text-only generation
     """
     try:
-        # Configure fal.ai client
-        fal_client.api_key = os.getenv('FAL_KEY')
-        print(f"🔑 FAL_KEY set: {bool(fal_client.api_key)}")
-        
-        if not fal_client.api_key:
-            print("❌ FAL_KEY not set")
-            raise RuntimeError("FAL_KEY not set")
-
         # Create enhanced prompt with style - try a simpler approach
         if style_label and style_label != "none":
             enhanced_prompt = f"{description}, {style_label} style"
         else:
             enhanced_prompt = description
         print(f"📝 Enhanced prompt: {enhanced_prompt}")
-        
-        # Prepare the request arguments for nano-banana (matching playground format)
-        arguments = {
-            "prompt": enhanced_prompt,
-            "num_images": 1,
-            "output_format": "jpeg",
-            "aspect_ratio": "1:1",
-            "sync_mode": False  # Don't wait for completion
-        }
-        
-        print(f"🚀 Calling fal.ai nano-banana with arguments: {json.dumps(arguments, indent=2)}")
-        
-        # Call fal.ai nano-banana API using run method
-        result = fal_client.run("fal-ai/nano-banana", arguments)
-        print(f"🎯 fal.ai result type: {type(result)}")
-        print(f"🎯 fal.ai result: {result}")
-        
-        # Download the generated image
-        print(f"🔍 Checking result structure...")
-        print(f"🔍 Result keys: {list(result.keys()) if isinstance(result, dict) else 'Not a dict'}")
-        print(f"🔍 Full result structure: {result}")
-        
-        # Try different possible result formats for nano-banana
-        image_url = None
-        
-        # Format 1: result['data']['images'][0]['url']
-        if result and 'data' in result and 'images' in result['data'] and len(result['data']['images']) > 0:
-            image_url = result['data']['images'][0]['url']
-            print(f"🖼️ Found image URL (format 1): {image_url}")
-        
-        # Format 2: result['images'][0]['url'] (direct images array)
-        elif result and 'images' in result and len(result['images']) > 0:
-            image_url = result['images'][0]['url']
-            print(f"🖼️ Found image URL (format 2): {image_url}")
-        
-        # Format 3: result['data']['url'] (single image)
-        elif result and 'data' in result and 'url' in result['data']:
-            image_url = result['data']['url']
-            print(f"🖼️ Found image URL (format 3): {image_url}")
-        
-        # Format 4: result['url'] (direct URL)
-        elif result and 'url' in result:
-            image_url = result['url']
-            print(f"🖼️ Found image URL (format 4): {image_url}")
-        
-        if image_url:
-            # Validate URL before making request
-            url_str = str(image_url).strip()
-            print(f"🔍 URL validation - original: {repr(image_url)}")
-            print(f"🔍 URL validation - string: {repr(url_str)}")
-            print(f"🔍 URL validation - starts with http: {url_str.startswith('http')}")
-            print(f"🔍 URL validation - starts with data: {url_str.startswith('data:')}")
-            
-            # Check if it's a base64 data URL
-            if url_str.startswith('data:image/'):
-                print("🖼️ Found base64 data URL, decoding directly")
-                try:
-                    # Extract base64 data from data URL
-                    header, data = url_str.split(',', 1)
-                    print(f"🔍 Data URL header: {header}")
-                    print(f"🔍 Data length: {len(data)}")
-                    
-                    # Decode base64 data
-                    image_data = base64.b64decode(data)
-                    print("✅ Successfully decoded base64 image data")
-                    return Image.open(io.BytesIO(image_data))
-                except Exception as decode_error:
-                    print(f"❌ Base64 decode error: {decode_error}")
-                    raise
-            
-            elif not url_str.startswith('http'):
-                print(f"❌ Invalid image URL format: {repr(image_url)}")
-                raise RuntimeError("Invalid image URL returned by model")
 
-            print(f"🖼️ Generated image URL: {image_url}")
-            response = requests.get(image_url)
-            if response.status_code == 200:
-                print("✅ Successfully downloaded generated image from nano-banana")
-                return Image.open(io.BytesIO(response.content))
-            else:
-                print(f"❌ Failed to download image: {response.status_code}")
-                raise RuntimeError(f"Image download failed: status {response.status_code}")
-        else:
+        outputs, result = run_workflow("nano-banana", {"prompt": enhanced_prompt})
+        if not outputs['image_url']:
             print(f"❌ No image URL found in result: {result}")
             raise RuntimeError("No image URL found in model result")
-            
+        return load_generated_image(outputs['image_url'])
+
     except Exception as e:
         print(f"❌ fal.ai nano-banana error: {e}")
-        print(f"❌ Error type: {type(e)}")
         print(f"❌ Traceback: {traceback.format_exc()}")
         raise
 
@@ -423,7 +184,12 @@ def root():
         "version": "1.0.0",
         "endpoints": {
             "health": "/health",
-            "generate": "/generate-image"
+            "generate": "/generate-image",
+            "podcast": "/generate-podcast",
+            "short_animation": "/generate-short-animation",
+            "video_with_audio": "/generate-video-with-audio",
+            "workflows": "/workflows",
+            "widget_feed": "/widget-feed/<couple_id>"
         }
     })
 
@@ -433,10 +199,13 @@ def health():
         "status": "OK",
         "timestamp": datetime.utcnow().isoformat(),
         "service": "Veramo API",
-        "version": "1.0.0"
+        "version": "1.0.0",
+        "lanes": scheduler.stats()
     })
 
 @app.route('/generate-image', methods=['POST'])
+@idempotent
+@scheduled(INTERACTIVE)
 def generate_image():
     """
     Generate an image based on description, images, and style label
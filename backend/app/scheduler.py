@@ -0,0 +1,325 @@
+import asyncio
+import hashlib
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from functools import wraps
+
+from app.supabase_rest import access_token_from
+
+# Priority lanes for fal work. Interactive image generations and long-running
+# video/podcast workflows get separate concurrency budgets, so a burst of video
+# jobs can never occupy the slots image requests need. Within a lane, waiting
+# requests are ordered by start-time fair queuing across users, so one user's
+# burst cannot starve everyone else in the same lane.
+#
+# The fairness key is never taken from headers a client can set freely: it is the
+# Supabase user behind a verified bearer token, else the peer address as seen by
+# the trusted proxy in front of the service. Verified users get a larger share
+# (VERAMO_WEIGHT_AUTHENTICATED) than anonymous callers (VERAMO_WEIGHT_ANONYMOUS).
+
+INTERACTIVE = 'interactive'
+LONG_RUNNING = 'long_running'
+
+
+class SchedulerBusy(Exception):
+    """Raised when a lane's queue is full or a request waited longer than the lane allows"""
+
+    def __init__(self, lane, reason):
+        super().__init__(f"{lane} lane busy: {reason}")
+        self.lane = lane
+        self.reason = reason
+
+
+class _Waiter:
+    __slots__ = ('user', 'wake', 'granted', 'cancelled')
+
+    def __init__(self, user, wake):
+        self.user = user
+        self.wake = wake
+        self.granted = False
+        self.cancelled = False
+
+
+class Lane:
+    """One concurrency budget with a fair queue of waiting requests"""
+
+    def __init__(self, name, concurrency, max_queue, max_wait):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._queue = []              # (start tag, seq, waiter)
+        self._virtual_time = 0.0
+        self._user_finish = {}        # user -> finish tag of their latest request
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+
+    def _enqueue(self, user, wake, weight):
+        """Admit immediately or queue the caller. Returns the waiter, already granted if a slot was free."""
+        waiter = _Waiter(user, wake)
+        with self._lock:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                waiter.granted = True
+                return waiter
+            if self.waiting >= self.max_queue:
+                raise SchedulerBusy(self.name, "queue full")
+
+            start = max(self._virtual_time, self._user_finish.get(user, 0.0))
+            self._user_finish[user] = start + 1.0 / weight
+            heapq.heappush(self._queue, (start, next(self._seq), waiter))
+            self.waiting += 1
+            return waiter
+
+    def _cancel(self, waiter):
+        """Withdraw a waiter that gave up. Returns True if it had already been granted a slot."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.cancelled = True
+            self.waiting -= 1
+            return False
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+            while self._queue and self.active < self.concurrency:
+                start, _, waiter = heapq.heappop(self._queue)
+                if waiter.cancelled:
+                    continue
+                self._virtual_time = start
+                self.waiting -= 1
+                self.active += 1
+                waiter.granted = True
+                waiter.wake()
+            if not self._queue:
+                # Idle lane: forget old finish tags so the map does not grow with every user seen
+                self._user_finish.clear()
+
+    def acquire(self, user, weight=1.0):
+        """Block the calling thread until a slot is granted"""
+        event = threading.Event()
+        waiter = self._enqueue(user, event.set, weight)
+        if waiter.granted or event.wait(self.max_wait):
+            return
+        if self._cancel(waiter):
+            return
+        raise SchedulerBusy(self.name, "timed out waiting for a slot")
+
+    async def acquire_async(self, user, weight=1.0):
+        """Wait on the event loop until a slot is granted"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        waiter = self._enqueue(user, wake, weight)
+        if waiter.granted:
+            return
+        try:
+            await asyncio.wait_for(future, self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if self._cancel(waiter):
+                if isinstance(e, asyncio.CancelledError):
+                    self.release()
+                    raise
+                return
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise SchedulerBusy(self.name, "timed out waiting for a slot")
+
+    def stats(self):
+        return {
+            "concurrency": self.concurrency,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_queue": self.max_queue,
+        }
+
+
+class Scheduler:
+    def __init__(self, lanes):
+        self.lanes = {lane.name: lane for lane in lanes}
+
+    @contextmanager
+    def slot(self, lane, user, weight=1.0):
+        lane = self.lanes[lane]
+        lane.acquire(user, weight)
+        try:
+            yield
+        finally:
+            lane.release()
+
+    @asynccontextmanager
+    async def slot_async(self, lane, user, weight=1.0):
+        lane = self.lanes[lane]
+        await lane.acquire_async(user, weight)
+        try:
+            yield
+        finally:
+            lane.release()
+
+    def stats(self):
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+
+def _env_int(name, default):
+    return int(os.getenv(name, default))
+
+
+# Default budgets for one Cloud Run instance (deploy.sh: 1 CPU, 512Mi, --concurrency 80).
+# Long-running jobs only wait on the fal queue, holding a thread or coroutine and a
+# few MB of upload, so the lane admits as many as the baseline service ran at once.
+# Interactive requests decode and re-encode images with Pillow (~15 MB each at peak),
+# which is what bounds that lane within 512Mi. Active plus queued requests across
+# both lanes add up to the 80 Cloud Run sends to an instance, so our 503s only fire
+# when one lane is saturated; beyond that Cloud Run scales out instead. A queued
+# request plus its job (videos take up to ~2 minutes) stays under the 300 s
+# Cloud Run request timeout.
+scheduler = Scheduler([
+    Lane(INTERACTIVE,
+         concurrency=_env_int('VERAMO_INTERACTIVE_CONCURRENCY', 16),
+         max_queue=_env_int('VERAMO_INTERACTIVE_QUEUE', 16),
+         max_wait=_env_int('VERAMO_INTERACTIVE_MAX_WAIT', 30)),
+    Lane(LONG_RUNNING,
+         concurrency=_env_int('VERAMO_LONG_RUNNING_CONCURRENCY', 32),
+         max_queue=_env_int('VERAMO_LONG_RUNNING_QUEUE', 16),
+         max_wait=_env_int('VERAMO_LONG_RUNNING_MAX_WAIT', 150)),
+])
+
+
+AUTHENTICATED = 'authenticated'
+ANONYMOUS = 'anonymous'
+
+TIER_WEIGHTS = {
+    AUTHENTICATED: float(os.getenv('VERAMO_WEIGHT_AUTHENTICATED', '2.0')),
+    ANONYMOUS: float(os.getenv('VERAMO_WEIGHT_ANONYMOUS', '1.0')),
+}
+
+# Proxies in front of the service that append the address they saw to
+# X-Forwarded-For. Cloud Run's front end is one; entries left of it are client-supplied.
+TRUSTED_PROXY_HOPS = _env_int('VERAMO_TRUSTED_PROXY_HOPS', 1)
+TOKEN_CACHE_SECONDS = 300
+
+_verified_tokens = {}         # token digest -> (user id or None, expiry timestamp)
+_verified_tokens_lock = threading.Lock()
+
+
+def peer_address(request):
+    """The caller's address as recorded by the nearest trusted proxy"""
+    if TRUSTED_PROXY_HOPS > 0:
+        forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+        if len(forwarded) >= TRUSTED_PROXY_HOPS:
+            return forwarded[-TRUSTED_PROXY_HOPS]
+    return request.remote_addr or 'unknown'
+
+
+def _cached_user(digest):
+    with _verified_tokens_lock:
+        entry = _verified_tokens.get(digest)
+    if entry and entry[1] > time.time():
+        return True, entry[0]
+    return False, None
+
+
+def _verify_token(token, digest):
+    """Resolve a bearer token to its Supabase user id (blocking, cached)"""
+    from app.supabase_rest import fetch_user_id, supabase_configured
+    user_id = None
+    if supabase_configured():
+        try:
+            user_id = fetch_user_id(token)
+        except Exception as e:
+            print(f"⚠️ Token verification failed: {e}")
+    now = time.time()
+    with _verified_tokens_lock:
+        for key in [k for k, (_, expiry) in _verified_tokens.items() if expiry <= now]:
+            del _verified_tokens[key]
+        _verified_tokens[digest] = (user_id, now + TOKEN_CACHE_SECONDS)
+    return user_id
+
+
+def _identity(user_id, request):
+    if user_id:
+        return f"user:{user_id}", TIER_WEIGHTS[AUTHENTICATED]
+    return f"ip:{peer_address(request)}", TIER_WEIGHTS[ANONYMOUS]
+
+
+def verified_user_id(request):
+    """Supabase user id behind the request's bearer token, or None (blocking on a cache miss)"""
+    token = access_token_from(request.headers)
+    if not token:
+        return None
+    digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    hit, user_id = _cached_user(digest)
+    return user_id if hit else _verify_token(token, digest)
+
+
+async def verified_user_id_async(request):
+    """verified_user_id for a Quart request; token checks run off the event loop"""
+    token = access_token_from(request.headers)
+    if not token:
+        return None
+    digest = hashlib.sha256(token.encode('utf-8')).hexdigest()
+    hit, user_id = _cached_user(digest)
+    if hit:
+        return user_id
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, _verify_token, token, digest)
+
+
+def requester(request):
+    """(fairness key, weight) for a Flask request"""
+    return _identity(verified_user_id(request), request)
+
+
+async def requester_async(request):
+    """(fairness key, weight) for a Quart request"""
+    return _identity(await verified_user_id_async(request), request)
+
+
+def busy_response(jsonify, error):
+    print(f"⏳ {error}")
+    response = jsonify({"error": f"Server busy, please retry: {error.reason}", "lane": error.lane})
+    response.status_code = 503
+    response.headers['Retry-After'] = '5' if error.lane == INTERACTIVE else '30'
+    return response
+
+
+def scheduled(lane):
+    """Run a Flask view inside a slot of the given lane (503 when the lane is saturated)"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import jsonify, request
+            user, weight = requester(request)
+            try:
+                with scheduler.slot(lane, user, weight):
+                    return view(*args, **kwargs)
+            except SchedulerBusy as e:
+                return busy_response(jsonify, e)
+        return wrapper
+    return decorator
+
+
+def scheduled_async(lane):
+    """Run a Quart view inside a slot of the given lane (503 when the lane is saturated)"""
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            from quart import jsonify, request
+            user, weight = await requester_async(request)
+            try:
+                async with scheduler.slot_async(lane, user, weight):
+                    return await view(*args, **kwargs)
+            except SchedulerBusy as e:
+                return busy_response(jsonify, e)
+        return wrapper
+    return decorator
@@ -0,0 +1,100 @@
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+# Streak engine: a streak is the number of consecutive days with at least one
+# share from either partner (see docs/PRD.md). Shared days are kept as runs in a
+# union-find keyed by day ordinal, so each share commit and each read is
+# amortized O(1) regardless of how long the couple has been together.
+
+
+class StreakEngine:
+    """Incremental streak counters for one couple"""
+
+    def __init__(self, tz_name='UTC'):
+        self.tz = ZoneInfo(tz_name or 'UTC')
+        self._parent = {}   # day ordinal -> parent day ordinal, roots are run starts
+        self._length = {}   # run start ordinal -> run length in days
+        self.longest = 0
+
+    def set_timezone(self, tz_name):
+        """Change the couple's timezone; applies to day boundaries of later shares"""
+        self.tz = ZoneInfo(tz_name or 'UTC')
+
+    def local_day(self, moment):
+        """Map a timestamp to the couple's local calendar day. Naive datetimes are treated as UTC."""
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.astimezone(self.tz).date()
+
+    def today(self, now=None):
+        return self.local_day(now or datetime.now(timezone.utc))
+
+    def _find(self, day):
+        parent = self._parent
+        while parent[day] != day:
+            # Path halving keeps later lookups flat
+            parent[day] = parent[parent[day]]
+            day = parent[day]
+        return day
+
+    def add_day(self, day):
+        """
+        Mark a calendar day as shared. Works for out-of-order days too, so backfilled
+        and scheduled shares merge with their neighbouring runs. Returns False if the
+        day was already shared.
+        """
+        ordinal = day.toordinal()
+        if ordinal in self._parent:
+            return False
+
+        self._parent[ordinal] = ordinal
+        start = ordinal
+        if ordinal - 1 in self._parent:
+            start = self._find(ordinal - 1)
+            self._parent[ordinal] = start
+            self._length[start] += 1
+        else:
+            self._length[ordinal] = 1
+
+        # The day after is always the start of its run, so it can be linked directly
+        if ordinal + 1 in self._parent:
+            self._parent[ordinal + 1] = start
+            self._length[start] += self._length.pop(ordinal + 1)
+
+        if self._length[start] > self.longest:
+            self.longest = self._length[start]
+        return True
+
+    def add_share(self, shared_at):
+        """Record a share by timestamp and return the local day it counted for"""
+        day = self.local_day(shared_at)
+        self.add_day(day)
+        return day
+
+    def has_day(self, day):
+        return day.toordinal() in self._parent
+
+    def current_streak(self, today=None):
+        """
+        Length of the streak ending today. A streak that ended yesterday is still
+        alive until the end of today; shares scheduled after today are not counted.
+        """
+        if today is None:
+            today = self.today()
+        anchor = today.toordinal()
+        for day in (anchor, anchor - 1):
+            if day in self._parent:
+                return day - self._find(day) + 1
+        return 0
+
+    def __len__(self):
+        return len(self._parent)
+
+
+def streak_from_days(days, tz_name='UTC'):
+    """Build an engine from an iterable of already shared calendar days"""
+    engine = StreakEngine(tz_name)
+    for day in days:
+        engine.add_day(day)
+    return engine
+
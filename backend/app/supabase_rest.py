@@ -0,0 +1,113 @@
+import os
+
+import requests
+
+# Minimal Supabase PostgREST access. Requests are made with the caller's own
+# access token, so Supabase row-level security decides what they can read,
+# exactly as it does for the iOS app.
+
+SUPABASE_URL = (os.getenv('SUPABASE_URL') or '').rstrip('/')
+SUPABASE_ANON_KEY = os.getenv('SUPABASE_ANON_KEY') or ''
+# Rows per request when paging; must not exceed the project's max-rows setting
+# (1000 by default), since PostgREST silently truncates larger pages.
+PAGE_SIZE = int(os.getenv('SUPABASE_PAGE_SIZE', 1000))
+
+_ENTRY_ORDER = "created_at.asc,id.asc"
+
+
+class SupabaseAuthError(Exception):
+    """The caller's access token was missing or rejected by Supabase"""
+
+
+def supabase_configured():
+    return bool(SUPABASE_URL and SUPABASE_ANON_KEY)
+
+
+def access_token_from(headers):
+    """The bearer token from an Authorization header, or '' if there is none"""
+    auth = headers.get('Authorization') or ''
+    if auth.lower().startswith('bearer '):
+        return auth[7:].strip()
+    return ''
+
+
+def select(table, params, access_token, timeout=10, row_range=None):
+    """GET rows from a table as the calling user, optionally one (first, last) page of them"""
+    if not access_token:
+        raise SupabaseAuthError("Missing access token")
+    headers = {
+        "apikey": SUPABASE_ANON_KEY,
+        "Authorization": f"Bearer {access_token}",
+        "Accept": "application/json",
+    }
+    if row_range is not None:
+        headers["Range-Unit"] = "items"
+        headers["Range"] = f"{row_range[0]}-{row_range[1]}"
+    response = requests.get(f"{SUPABASE_URL}/rest/v1/{table}", params=params, headers=headers, timeout=timeout)
+    if response.status_code in (401, 403):
+        raise SupabaseAuthError("Access token rejected")
+    response.raise_for_status()
+    return response.json()
+
+
+def select_all(table, params, access_token, page_size=None):
+    """All matching rows, fetched page by page with Range headers. params must fix a total order."""
+    page_size = page_size or PAGE_SIZE
+    rows = []
+    while True:
+        page = select(table, params, access_token, row_range=(len(rows), len(rows) + page_size - 1))
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+
+
+def fetch_active_couple(couple_id, access_token):
+    """The couple row if the caller may see it (RLS limits this to its partners), else None"""
+    rows = select("couples", {
+        "select": "id",
+        "id": f"eq.{couple_id}",
+        "is_active": "eq.true",
+    }, access_token)
+    return rows[0] if rows else None
+
+
+def fetch_shared_days(couple_id, access_token):
+    """Day and creation time of every Shared Calendar entry of a couple, without image data"""
+    return select_all("calendar_entries", {
+        "select": "date,created_at",
+        "couple_id": f"eq.{couple_id}",
+        "order": _ENTRY_ORDER,
+    }, access_token)
+
+
+def fetch_entries_from_day(couple_id, day, access_token):
+    """Entries (with image data) for a calendar day and the days after it"""
+    return select_all("calendar_entries", {
+        "select": "date,image_data,created_at",
+        "couple_id": f"eq.{couple_id}",
+        "date": f"gte.{day.isoformat()}",
+        "order": _ENTRY_ORDER,
+    }, access_token)
+
+
+def fetch_entries_created_after(couple_id, created_at, access_token):
+    """Entries (with image data) created after the given created_at value"""
+    return select_all("calendar_entries", {
+        "select": "date,image_data,created_at",
+        "couple_id": f"eq.{couple_id}",
+        "created_at": f"gt.{created_at}",
+        "order": _ENTRY_ORDER,
+    }, access_token)
+
+
+def fetch_user_id(access_token, timeout=5):
+    """The Supabase user id an access token belongs to, or None if Supabase rejects it"""
+    response = requests.get(
+        f"{SUPABASE_URL}/auth/v1/user",
+        headers={"apikey": SUPABASE_ANON_KEY, "Authorization": f"Bearer {access_token}"},
+        timeout=timeout,
+    )
+    if response.status_code in (401, 403):
+        return None
+    response.raise_for_status()
+    return response.json().get('id')
@@ -0,0 +1,216 @@
+import atexit
+import gzip
+import json
+import os
+import queue
+import random
+import threading
+import time
+
+from PIL import Image
+
+# Opt-in request recorder for production-trace replay (see tools/replay_trace.py).
+# Set VERAMO_TRACE_FILE to a path (".gz" for gzip) to enable it. Only request
+# shapes are recorded - counts, sizes, style labels, durations, prompt lengths and
+# timings - never prompt text, image content, URLs or user identifiers.
+#
+# Each record carries "epoch", the wall-clock arrival time, so traces from several
+# processes or instances can be merged and replayed on one timeline. Request hooks
+# only enqueue records; a background thread writes them in batches, each batch as
+# one append (one gzip member for ".gz"), so the request path never touches disk.
+# Responses replayed from the idempotency store are not recorded: they are client
+# retries of a request already in the trace, and replaying them as fresh arrivals
+# would double the generation work.
+
+TRACED_PATHS = {
+    '/generate-image',
+    '/generate-podcast',
+    '/generate-short-animation',
+    '/generate-video-with-audio',
+}
+
+TRACE_FILE = os.getenv('VERAMO_TRACE_FILE')
+TRACE_SAMPLE_RATE = float(os.getenv('VERAMO_TRACE_SAMPLE_RATE', '1.0'))
+FLUSH_INTERVAL = float(os.getenv('VERAMO_TRACE_FLUSH_SECONDS', '2.0'))
+MAX_BATCH = 500
+MAX_PENDING = 10000
+
+
+def tracing_enabled():
+    return bool(TRACE_FILE)
+
+
+def _image_shape(file_storage):
+    """Byte size and pixel dimensions of an uploaded file, leaving the stream rewound"""
+    stream = file_storage.stream
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell()
+    stream.seek(0)
+    try:
+        with Image.open(stream) as img:
+            width, height = img.size
+    except Exception:
+        width = height = None
+    stream.seek(0)
+    return [size, width, height]
+
+
+def request_shape(path, form, files, data):
+    """Anonymized shape of a generation request"""
+    data = data or {}
+    text = form.get('description') or form.get('prompt') or data.get('description') or data.get('prompt') or ''
+    duration = form.get('duration') or data.get('duration')
+    images = [_image_shape(f) for key in ('images', 'image') for f in files.getlist(key) if f and f.filename]
+    return {
+        "p": path,
+        "ct": "multipart" if files or form else "json",
+        "prompt_len": len(text),
+        "style": form.get('style_label') or data.get('style_label'),
+        "duration": duration,
+        "images": images,
+        "image_url": bool(form.get('image_url') or data.get('image_url')),
+    }
+
+
+class TraceWriter(threading.Thread):
+    """Background writer that appends queued trace records to a file in batches"""
+
+    def __init__(self, path, flush_interval=FLUSH_INTERVAL):
+        super().__init__(name='trace-writer', daemon=True)
+        self.path = path
+        self.flush_interval = flush_interval
+        self.records = queue.Queue(maxsize=MAX_PENDING)
+        self.dropped = 0
+        self.stopped = threading.Event()
+
+    def submit(self, record):
+        try:
+            self.records.put_nowait(record)
+        except queue.Full:
+            # Never block a request on the recorder; a full queue means the disk is stuck
+            self.dropped += 1
+
+    def _write(self, batch):
+        data = ''.join(json.dumps(r, separators=(',', ':')) + '\n' for r in batch).encode('utf-8')
+        if self.path.endswith('.gz'):
+            # Concatenated gzip members read back as one stream
+            data = gzip.compress(data)
+        # One append per batch keeps batches from concurrent processes whole
+        with open(self.path, 'ab') as f:
+            f.write(data)
+
+    def flush(self):
+        while True:
+            batch = []
+            while len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self.records.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            try:
+                self._write(batch)
+            except Exception as e:
+                print(f"⚠️ Trace write failed ({len(batch)} records): {e}")
+
+    def run(self):
+        # Records accumulate between flushes so each append carries a batch
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+        self.flush()
+
+    def close(self, timeout=5):
+        """Flush pending records and stop the thread"""
+        self.stopped.set()
+        self.join(timeout)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def trace_writer():
+    """The process-wide writer, started on first use (and again after a fork)"""
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = TraceWriter(TRACE_FILE)
+            _writer.start()
+            atexit.register(_writer.close)
+        return _writer
+
+
+def _finish_record(shape, started, response):
+    if response.headers.get('Idempotent-Replayed'):
+        return
+    shape["epoch"] = round(started, 3)
+    shape["ms"] = round((time.perf_counter() - shape.pop("_perf")) * 1000, 1)
+    shape["status"] = response.status_code
+    # From the Content-Length header: calculate_content_length() is None for send_file responses
+    shape["resp_bytes"] = response.content_length
+    trace_writer().submit(shape)
+
+
+def init_flask_tracing(app):
+    """Register recorder hooks on a Flask app when VERAMO_TRACE_FILE is set"""
+    if not tracing_enabled():
+        return
+    from flask import g, request
+
+    @app.before_request
+    def _trace_before():
+        if request.path not in TRACED_PATHS or random.random() >= TRACE_SAMPLE_RATE:
+            return
+        data = request.get_json(silent=True) if request.is_json else None
+        g.trace_shape = request_shape(request.path, request.form, request.files, data)
+        g.trace_shape["_perf"] = time.perf_counter()
+        g.trace_started = time.time()
+
+    @app.after_request
+    def _trace_after(response):
+        shape = g.pop('trace_shape', None)
+        if shape is not None:
+            _finish_record(shape, g.trace_started, response)
+        return response
+
+    print(f"📼 Recording request traces to {TRACE_FILE}")
+
+
+def init_quart_tracing(app):
+    """Register recorder hooks on the Quart (ASGI) app when VERAMO_TRACE_FILE is set"""
+    if not tracing_enabled():
+        return
+    from quart import g, request
+
+    @app.before_request
+    async def _trace_before():
+        if request.path not in TRACED_PATHS or random.random() >= TRACE_SAMPLE_RATE:
+            return
+        data = await request.get_json(silent=True) if request.is_json else None
+        shape = request_shape(request.path, await request.form, await request.files, data)
+        shape["_perf"] = time.perf_counter()
+        g.trace_shape = shape
+        g.trace_started = time.time()
+
+    @app.after_request
+    async def _trace_after(response):
+        shape = g.pop('trace_shape', None)
+        if shape is not None:
+            _finish_record(shape, g.trace_started, response)
+        return response
+
+    print(f"📼 Recording request traces to {TRACE_FILE}")
+
+
+def process_stats():
+    """Current and peak resident memory of this process, for replay comparisons"""
+    import resource
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    rss_kb = None
+    try:
+        with open('/proc/self/statm') as f:
+            rss_kb = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // 1024
+    except (OSError, ValueError):
+        pass
+    return {"rss_kb": rss_kb, "max_rss_kb": peak_kb, "pid": os.getpid()}
@@ -0,0 +1,325 @@
+from flask import Blueprint, Response, request, jsonify
+from datetime import datetime, date, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+import hashlib
+import json
+import os
+import threading
+import time
+
+from app.streaks import StreakEngine
+from app.supabase_rest import (SupabaseAuthError, access_token_from, fetch_active_couple,
+                               fetch_entries_created_after, fetch_entries_from_day, fetch_shared_days,
+                               supabase_configured)
+
+# Widget feed: one precomputed payload per couple, served with a strong ETag so
+# widget timeline reloads that find nothing new get a bodyless 304.
+#
+# Supabase's calendar_entries table is the system of record. This module only
+# caches a couple's derived state (streak runs and today's thumbnail) per
+# instance: a cache miss, a restart or another instance rebuilds it from
+# Supabase (shared days for the whole history, image data only from yesterday
+# on). After WIDGET_FEED_REFRESH_SECONDS a request pulls just the entries created
+# since the newest one seen, so shares committed through other instances show up
+# without rescanning the history. The widget passes the couple's timezone as
+# ?tz=, which decides what "today" is. Every request carries the caller's
+# Supabase access token and Supabase row-level security decides whether they may
+# see the couple, the same as for the rest of the user data.
+widget_feed_bp = Blueprint('widget_feed', __name__)
+
+REFRESH_AFTER = int(os.getenv('WIDGET_FEED_REFRESH_SECONDS', 300))
+AUTH_CACHE_SECONDS = int(os.getenv('WIDGET_FEED_AUTH_CACHE_SECONDS', 300))
+
+_feeds = {}
+_feeds_lock = threading.Lock()
+_authorized = {}          # (token digest, couple_id) -> expiry timestamp
+_authorized_lock = threading.Lock()
+# created_at lower bound for the first incremental refresh of a couple with no entries
+_NO_ENTRIES = '1970-01-01T00:00:00+00:00'
+
+
+class WidgetFeedError(Exception):
+    """A request the widget feed refuses, with the HTTP status to answer with"""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def _parse_shared_at(value):
+    if not value:
+        return None
+    return datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+
+
+def _build_payload(couple_id, state, today):
+    """Serialize the widget payload for a couple and derive its strong ETag"""
+    # Thumbnails for days that have passed can never be shown again. Yesterday's is
+    # kept, as on hydration, in case the couple's timezone turns out to be behind.
+    thumbnails = state['thumbnails']
+    for day in [d for d in thumbnails if d < today - timedelta(days=1)]:
+        del thumbnails[day]
+
+    thumbnail_url, storage_path, shared_at = thumbnails.get(today, (None, None, None))
+    payload = {
+        "couple_id": couple_id,
+        "date": today.isoformat(),
+        "thumbnail_url": thumbnail_url,
+        "storage_path": storage_path,
+        "shared_at": shared_at,
+        "streak": state['engine'].current_streak(today),
+    }
+    body = json.dumps(payload, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    etag = hashlib.sha256(body).hexdigest()[:32]
+    return {"day": today, "body": body, "etag": etag}
+
+
+def _new_state(tz_name=None):
+    return {
+        "engine": StreakEngine(tz_name),
+        # local day -> (thumbnail_url, storage_path, shared_at), today and scheduled days only
+        "thumbnails": {},
+        "payload": None,
+        "checked_at": time.time(),
+        # created_at of the newest Supabase entry applied, where the next refresh resumes
+        "synced_through": _NO_ENTRIES,
+    }
+
+
+def _check_timezone(tz_name):
+    if tz_name is None:
+        return None
+    try:
+        ZoneInfo(tz_name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise WidgetFeedError("Invalid timezone", 400)
+    return tz_name
+
+
+def _apply_entries(state, entries):
+    """Add Supabase entries (ordered by created_at) to the state; the latest share of a day wins"""
+    engine = state['engine']
+    # The day before today covers a timezone set after the thumbnails were loaded
+    earliest_thumbnail = engine.today() - timedelta(days=1)
+    for entry in entries:
+        try:
+            day = date.fromisoformat(entry['date'])
+        except (KeyError, TypeError, ValueError):
+            continue
+        engine.add_day(day)
+        if day >= earliest_thumbnail:
+            image_data = entry.get('image_data') if isinstance(entry.get('image_data'), dict) else {}
+            state['thumbnails'][day] = (
+                image_data.get('thumbnail_url') or image_data.get('url'),
+                image_data.get('storage_path'),
+                entry.get('created_at'),
+            )
+    if entries:
+        state['synced_through'] = max(state['synced_through'], entries[-1].get('created_at') or _NO_ENTRIES)
+        state['payload'] = None
+
+
+def _hydrate_state(couple_id, access_token, tz_name=None):
+    """Build a couple's state from their Shared Calendar entries in Supabase"""
+    state = _new_state(tz_name)
+    engine = state['engine']
+    days = fetch_shared_days(couple_id, access_token)
+    for row in days:
+        try:
+            engine.add_day(date.fromisoformat(row['date']))
+        except (KeyError, TypeError, ValueError):
+            continue
+    if days:
+        state['synced_through'] = days[-1].get('created_at') or _NO_ENTRIES
+    # Image data is only needed for the days the widget can still show
+    recent = fetch_entries_from_day(couple_id, engine.today() - timedelta(days=1), access_token)
+    synced_through = state['synced_through']
+    _apply_entries(state, recent)
+    # Resume refreshes from the history query, so entries created between the two
+    # queries are fetched again rather than skipped
+    state['synced_through'] = synced_through
+    print(f"💧 Hydrated widget feed for couple {couple_id}: {len(engine)} shared days")
+    return state
+
+
+def authorize(couple_id, access_token):
+    """Check through Supabase RLS that the caller is a partner of the couple"""
+    if not supabase_configured():
+        raise WidgetFeedError("Widget feed is not configured (SUPABASE_URL / SUPABASE_ANON_KEY)", 503)
+    if not access_token:
+        raise WidgetFeedError("Authorization bearer token is required", 401)
+
+    cache_key = (hashlib.sha256(access_token.encode('utf-8')).hexdigest(), couple_id)
+    now = time.time()
+    with _authorized_lock:
+        if _authorized.get(cache_key, 0) > now:
+            return
+    try:
+        couple = fetch_active_couple(couple_id, access_token)
+    except SupabaseAuthError:
+        raise WidgetFeedError("Invalid or expired access token", 401)
+    if couple is None:
+        raise WidgetFeedError("Couple not found", 404)
+
+    with _authorized_lock:
+        for key in [k for k, expiry in _authorized.items() if expiry <= now]:
+            del _authorized[key]
+        _authorized[cache_key] = now + AUTH_CACHE_SECONDS
+
+
+def _load_state(couple_id, access_token, tz_name=None):
+    """
+    Return the cached state, hydrating it from Supabase on a miss and pulling the
+    entries created since the last sync once it is older than REFRESH_AFTER.
+    """
+    with _feeds_lock:
+        state = _feeds.get(couple_id)
+        if state is not None:
+            if tz_name and tz_name != state['engine'].tz.key:
+                state['engine'].set_timezone(tz_name)
+                state['payload'] = None
+            if time.time() - state['checked_at'] < REFRESH_AFTER:
+                return state
+            synced_through = state['synced_through']
+
+    try:
+        if state is None:
+            hydrated = _hydrate_state(couple_id, access_token, tz_name)
+            with _feeds_lock:
+                # Another request may have hydrated the couple meanwhile; either copy is complete
+                return _feeds.setdefault(couple_id, hydrated)
+        entries = fetch_entries_created_after(couple_id, synced_through, access_token)
+    except SupabaseAuthError:
+        raise WidgetFeedError("Invalid or expired access token", 401)
+
+    with _feeds_lock:
+        _apply_entries(state, entries)
+        state['checked_at'] = time.time()
+        return state
+
+
+def commit_share(couple_id, thumbnail_url, share_day=None, shared_at=None, tz_name=None,
+                 storage_path=None):
+    """
+    Apply a newly committed share to the couple's cached state and rebuild the payload.
+    The share counts for share_day if given (scheduled or backfilled shares), otherwise
+    for the couple-local day of shared_at. Never rescans the couple's history.
+    """
+    with _feeds_lock:
+        state = _feeds.get(couple_id)
+        if state is None:
+            state = _feeds[couple_id] = _new_state(tz_name)
+        elif tz_name:
+            state['engine'].set_timezone(tz_name)
+        engine = state['engine']
+
+        shared_at_dt = _parse_shared_at(shared_at)
+        if share_day is None:
+            share_day = engine.local_day(shared_at_dt or datetime.utcnow())
+        engine.add_day(share_day)
+
+        today = engine.today()
+        if share_day >= today:
+            # Later commits for the same day replace the widget image
+            state['thumbnails'][share_day] = (thumbnail_url, storage_path, shared_at)
+
+        state['payload'] = _build_payload(couple_id, state, today)
+        return state['payload']
+
+
+def get_payload(couple_id, access_token, tz_name=None):
+    """
+    Return the precomputed payload, rebuilding it only when new shares arrived or
+    the couple's day has rolled over. tz_name is the couple's IANA timezone, if known.
+    """
+    tz_name = _check_timezone(tz_name or None)
+    authorize(couple_id, access_token)
+    state = _load_state(couple_id, access_token, tz_name)
+    with _feeds_lock:
+        today = state['engine'].today()
+        payload = state['payload']
+        if payload is None or payload['day'] != today:
+            payload = state['payload'] = _build_payload(couple_id, state, today)
+        return payload
+
+
+def _optional_str(data, name):
+    value = data.get(name)
+    if value is None:
+        return None
+    if not isinstance(value, str):
+        raise WidgetFeedError(f"{name} must be a string", 400)
+    return value.strip() or None
+
+
+def commit_share_from_json(couple_id, data, access_token):
+    """Validate a share commit body and apply it. Raises WidgetFeedError with a client-facing message."""
+    if not isinstance(data, dict):
+        raise WidgetFeedError("JSON object body is required", 400)
+    thumbnail_url = _optional_str(data, 'thumbnail_url')
+    if not thumbnail_url:
+        raise WidgetFeedError("thumbnail_url is required", 400)
+    storage_path = _optional_str(data, 'storage_path')
+    tz_name = _check_timezone(_optional_str(data, 'timezone'))
+    day_str = _optional_str(data, 'date')
+    shared_at = _optional_str(data, 'shared_at')
+
+    try:
+        share_day = date.fromisoformat(day_str) if day_str else None
+        _parse_shared_at(shared_at)
+    except ValueError:
+        raise WidgetFeedError("Invalid date or shared_at", 400)
+
+    authorize(couple_id, access_token)
+    _load_state(couple_id, access_token, tz_name)
+    return commit_share(couple_id, thumbnail_url, share_day, shared_at, tz_name, storage_path)
+
+
+def feed_response(response_class, payload, status=200):
+    """Build the payload response with the Flask or Quart Response class"""
+    response = response_class(payload['body'] if status == 200 else b'', status=status, mimetype='application/json')
+    response.set_etag(payload['etag'])
+    # Clients may keep the payload but must revalidate before reusing it
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+@widget_feed_bp.route('/widget-feed/<couple_id>', methods=['GET'])
+def widget_feed(couple_id):
+    """
+    Serve the widget payload (today's thumbnail, streak, date) for a couple.
+    Requires the caller's Supabase access token as a bearer token.
+    Query: tz (optional IANA timezone of the couple, e.g. "America/Los_Angeles").
+    Returns 304 with no body when If-None-Match carries the current ETag.
+    """
+    try:
+        payload = get_payload(couple_id, access_token_from(request.headers), request.args.get('tz'))
+    except WidgetFeedError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Widget feed failed: {str(e)}"}), 500
+
+    # If-None-Match uses the weak comparison (RFC 9110 13.1.2)
+    if request.if_none_match.contains_weak(payload['etag']):
+        return feed_response(Response, payload, status=304)
+    return feed_response(Response, payload)
+
+
+@widget_feed_bp.route('/widget-feed/<couple_id>/shares', methods=['POST'])
+def commit_widget_share(couple_id):
+    """
+    Record a share committed to the Shared Calendar and rebuild the couple's payload.
+    Requires the caller's Supabase access token as a bearer token.
+    JSON body: { thumbnail_url: string, storage_path: string (optional),
+                 shared_at: ISO 8601 (optional),
+                 date: YYYY-MM-DD (optional, for scheduled or backfilled shares),
+                 timezone: IANA name (optional, e.g. "Europe/Istanbul") }
+    """
+    try:
+        payload = commit_share_from_json(couple_id, request.get_json(silent=True),
+                                         access_token_from(request.headers))
+        return feed_response(Response, payload)
+    except WidgetFeedError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": f"Widget share commit failed: {str(e)}"}), 500
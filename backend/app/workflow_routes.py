@@ -0,0 +1,234 @@
+from flask import Blueprint, request, jsonify
+from werkzeug.utils import secure_filename
+import os
+import requests
+
+from app.fal_helpers import configure_fal, upload_bytes_to_fal
+from app.workflows import WORKFLOWS, WorkflowInputError, get_workflow, run_workflow
+from app.idempotency import idempotent
+from app.scheduler import LONG_RUNNING, SchedulerBusy, busy_response, requester, scheduled, scheduler
+
+# HTTP handlers for the registered fal workflows. The per-workflow routes keep the
+# request/response contracts of the former standalone podcast, short animation and
+# video-with-audio services.
+workflows_bp = Blueprint('workflows', __name__)
+
+
+def podcast_payload(outputs):
+    """Response body for a couplepodcast result, or None if no audio came back"""
+    audio_url = outputs['audio_url']
+    if not audio_url:
+        return None
+    return {
+        "audio": {
+            "url": audio_url,
+            "content_type": "application/octet-stream",
+            "file_name": os.path.basename(audio_url)
+        },
+        "duration": outputs['duration'],
+        "error": None
+    }
+
+
+def short_animation_payload(outputs):
+    """Response body for a short-couple-video result, or None if no video came back"""
+    if not outputs['video_url']:
+        return None
+    return {
+        "video": {
+            "url": outputs['video_url'],
+            "content_type": outputs['content_type'] or 'video/mp4',
+            "file_name": outputs['file_name'] or 'short_animation.mp4'
+        },
+        "error": None
+    }
+
+
+def video_with_audio_payload(outputs):
+    """Response body for a short-couple-video-audio result, or None if no video came back"""
+    video_url = outputs['video_url']
+    if not video_url:
+        return None
+    return {
+        "video": {
+            "url": video_url,
+            "content_type": "video/mp4",
+            "file_name": os.path.basename(video_url),
+        },
+        "error": None,
+    }
+
+
+def _json_object(data):
+    return data if isinstance(data, dict) else {}
+
+
+def is_remote_url(url):
+    return url.startswith('http://') or url.startswith('https://')
+
+
+def podcast_arguments(data):
+    """couplepodcast arguments from a /generate-podcast JSON body"""
+    prompt = _json_object(data).get('prompt', '')
+    if not prompt:
+        raise WorkflowInputError("Prompt is required")
+    return {"prompt": prompt}
+
+
+def short_animation_request(multipart, form, data, image_file):
+    """
+    Validate a /generate-short-animation request and return (description, duration, image_url).
+    Multipart requests carry the image as a file, so image_url is None and the caller uploads it.
+    JSON requests carry image_url as a data URI or a remote URL (which the caller re-hosts on fal).
+    """
+    if multipart:
+        # Expecting fields: description (text), image (file), duration (optional, default 5)
+        description = form.get('description', '').strip()
+        duration = form.get('duration', '5').strip()
+        if not description:
+            raise WorkflowInputError("description is required")
+        if not image_file:
+            raise WorkflowInputError("image file is required")
+        return description, duration, None
+
+    # JSON body: { description: string, image_url: string | data_uri, duration: number (optional, default 5) }
+    data = _json_object(data)
+    description = (data.get('description') or '').strip()
+    image_url = (data.get('image_url') or '').strip()
+    duration = data.get('duration', 5)
+    if not description:
+        raise WorkflowInputError("description is required")
+    if not image_url:
+        raise WorkflowInputError("image_url is required")
+    return description, duration, image_url
+
+
+def video_with_audio_request(form, data):
+    """(description, duration, image_url) from a /generate-video-with-audio form or JSON body"""
+    data = _json_object(data)
+    return (form.get('description') or data.get('description'),
+            form.get('duration') or data.get('duration'),
+            form.get('image_url') or data.get('image_url'))
+
+
+def video_arguments(description, image_url, duration):
+    """Arguments for the short-couple-video workflows"""
+    if not description or not image_url:
+        raise WorkflowInputError("Description and image are required")
+    return {
+        "concept_description": description,
+        "image_url_field": image_url,
+        "duration": duration,
+    }
+
+
+@workflows_bp.route('/workflows', methods=['GET'])
+def list_workflows():
+    return jsonify({name: workflow.describe() for name, workflow in WORKFLOWS.items()})
+
+
+@workflows_bp.route('/workflows/<name>', methods=['POST'])
+def generic_workflow(name):
+    """Run any registered workflow with a JSON body matching its input schema"""
+    try:
+        workflow = get_workflow(name)
+    except KeyError as e:
+        return jsonify({"error": str(e)}), 404
+
+    user, weight = requester(request)
+    try:
+        with scheduler.slot(workflow.lane, user, weight):
+            outputs, _ = run_workflow(name, request.get_json(silent=True) or {})
+        return jsonify({"outputs": outputs, "error": None})
+    except SchedulerBusy as e:
+        return busy_response(jsonify, e)
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Workflow {name} failed: {str(e)}"}), 500
+
+
+@workflows_bp.route('/generate-podcast', methods=['POST'])
+@idempotent
+@scheduled(LONG_RUNNING)
+def generate_podcast():
+    try:
+        if not configure_fal():
+            return jsonify({"error": "FAL_KEY not set"}), 500
+
+        outputs, _ = run_workflow('couplepodcast', podcast_arguments(request.get_json(silent=True)))
+        payload = podcast_payload(outputs)
+        if not payload:
+            return jsonify({"error": "Failed to generate audio or retrieve URL from Fal workflow"}), 500
+        return jsonify(payload)
+
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Podcast generation failed: {str(e)}"}), 500
+
+
+@workflows_bp.route('/generate-short-animation', methods=['POST'])
+@idempotent
+@scheduled(LONG_RUNNING)
+def generate_short_animation():
+    try:
+        if not configure_fal():
+            return jsonify({"error": "FAL_KEY not set"}), 500
+
+        multipart = bool(request.content_type and request.content_type.startswith('multipart/form-data'))
+        image_file = request.files.get('image')
+        description, duration, image_url = short_animation_request(
+            multipart, request.form, None if multipart else request.get_json(silent=True), image_file)
+
+        if image_url is None:
+            # Upload the image to fal to obtain a hosted URL (recommended by fal)
+            image_url = upload_bytes_to_fal(image_file.read())
+        elif is_remote_url(image_url):
+            # Re-host remote URLs on fal so the workflow can always reach them
+            resp = requests.get(image_url, timeout=30)
+            resp.raise_for_status()
+            image_url = upload_bytes_to_fal(resp.content)
+
+        outputs, result = run_workflow('short-couple-video', video_arguments(description, image_url, duration))
+
+        payload = short_animation_payload(outputs)
+        if not payload:
+            return jsonify({"error": "Failed to retrieve video URL from workflow result", "raw": result}), 502
+        return jsonify(payload)
+
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error generating short animation: {e}")
+        return jsonify({"error": f"Short animation generation failed: {str(e)}"}), 500
+
+
+@workflows_bp.route('/generate-video-with-audio', methods=['POST'])
+@idempotent
+@scheduled(LONG_RUNNING)
+def generate_video_with_audio():
+    try:
+        if not configure_fal():
+            return jsonify({"error": "FAL_KEY not set"}), 500
+
+        data = request.get_json(silent=True) if request.is_json else None
+        description, duration, image_url = video_with_audio_request(request.form, data)
+
+        # Handle image file upload -> fal-hosted URL
+        image_file = request.files.get('image')
+        if image_file and image_file.filename:
+            suffix = os.path.splitext(secure_filename(image_file.filename))[1] or ".bin"
+            image_url = upload_bytes_to_fal(image_file.read(), suffix=suffix)
+
+        outputs, _ = run_workflow('short-couple-video-audio', video_arguments(description, image_url, duration))
+
+        payload = video_with_audio_payload(outputs)
+        if not payload:
+            return jsonify({"error": "Failed to generate video or missing URL in response"}), 500
+        return jsonify(payload)
+
+    except WorkflowInputError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": f"Video with audio generation failed: {str(e)}"}), 500
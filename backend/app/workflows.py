@@ -0,0 +1,260 @@
+import fal_client
+
+from app.fal_helpers import configure_fal
+from app.scheduler import INTERACTIVE, LONG_RUNNING
+
+# Workflow registry: every fal application the backend calls (the odtboun
+# workflows and the image models) is declared once here with its input schema
+# and precompiled result extractors, so a single deployment can serve all of them.
+#
+# Inputs are what a caller may set. Options are fixed server-side arguments (model
+# settings, safety tolerance, system prompts) that build_arguments always applies on
+# top of the inputs, so no request can change them.
+
+WORKFLOWS = {}
+
+
+class WorkflowInputError(ValueError):
+    """Raised when request arguments do not match a workflow's input schema"""
+
+
+class Field:
+    """One declared workflow input"""
+
+    def __init__(self, name, type=str, required=False, default=None):
+        self.name = name
+        self.type = type
+        self.required = required
+        self.default = default
+
+    def coerce(self, value):
+        if value is None or (isinstance(value, str) and not value.strip()):
+            if self.required:
+                raise WorkflowInputError(f"{self.name} is required")
+            return list(self.default) if isinstance(self.default, list) else self.default
+        if self.type is str:
+            return str(value).strip()
+        if self.type is int:
+            try:
+                return int(value)
+            except (ValueError, TypeError):
+                if self.default is None:
+                    raise WorkflowInputError(f"{self.name} must be an integer")
+                return self.default
+        if self.type is list:
+            return list(value) if isinstance(value, (list, tuple)) else [value]
+        return value
+
+
+def _compile_path(path):
+    """'output.0.url' -> ('output', 0, 'url')"""
+    return tuple(int(part) if part.isdigit() else part for part in path.split('.'))
+
+
+class ResultExtractor:
+    """Pulls one value out of a fal result by trying known result shapes in order"""
+
+    def __init__(self, *paths):
+        self.paths = [_compile_path(path) for path in paths]
+
+    def __call__(self, result):
+        for path in self.paths:
+            value = result
+            for key in path:
+                if isinstance(key, int):
+                    if not isinstance(value, list) or len(value) <= key:
+                        value = None
+                        break
+                    value = value[key]
+                elif isinstance(value, dict):
+                    value = value.get(key)
+                else:
+                    value = None
+                    break
+            if value:
+                return value
+        return None
+
+
+class Workflow:
+    """A registered fal application with declared client inputs, fixed options and outputs"""
+
+    def __init__(self, name, application, inputs, outputs, options=None, lane=INTERACTIVE):
+        self.name = name
+        self.application = application
+        self.inputs = inputs
+        self.options = dict(options or {})
+        self.outputs = outputs
+        self.lane = lane
+
+    def build_arguments(self, data):
+        """Validate and coerce request data against the input schema, then apply the fixed options"""
+        if not isinstance(data, dict):
+            raise WorkflowInputError("JSON object body is required")
+        arguments = {field.name: field.coerce(data.get(field.name)) for field in self.inputs}
+        arguments.update(self.options)
+        return arguments
+
+    def extract(self, result):
+        """Map a raw fal result to the declared outputs (missing outputs are None)"""
+        if not isinstance(result, dict):
+            return {name: None for name in self.outputs}
+        return {name: extractor(result) for name, extractor in self.outputs.items()}
+
+    def describe(self):
+        return {
+            "application": self.application,
+            "inputs": [
+                {"name": f.name, "type": f.type.__name__, "required": f.required, "default": f.default}
+                for f in self.inputs
+            ],
+            "outputs": list(self.outputs),
+            "lane": self.lane,
+        }
+
+
+def register_workflow(workflow):
+    WORKFLOWS[workflow.name] = workflow
+    return workflow
+
+
+def get_workflow(name):
+    workflow = WORKFLOWS.get(name)
+    if workflow is None:
+        raise KeyError(f"Unknown workflow: {name}")
+    return workflow
+
+
+def run_workflow(name, data):
+    """
+    Validate data against the workflow schema, run it on fal and return
+    (outputs, raw_result). Raises WorkflowInputError for bad input.
+    """
+    workflow = get_workflow(name)
+    if not configure_fal():
+        raise RuntimeError("FAL_KEY not set")
+
+    arguments = workflow.build_arguments(data)
+    print(f"🚀 Running workflow '{name}' ({workflow.application})")
+    result = fal_client.submit(workflow.application, arguments=arguments).get()
+    return workflow.extract(result), result
+
+
+async def run_workflow_async(name, data):
+    """Async variant of run_workflow: waits on the fal queue without holding a thread"""
+    workflow = get_workflow(name)
+    if not configure_fal():
+        raise RuntimeError("FAL_KEY not set")
+
+    arguments = workflow.build_arguments(data)
+    print(f"🚀 Running workflow '{name}' ({workflow.application}) [async]")
+    handle = await fal_client.submit_async(workflow.application, arguments=arguments)
+    result = await handle.get()
+    return workflow.extract(result), result
+
+
+PODCAST_SYSTEM_PROMPT = (
+    "the output should be an audio podcast script about a couple, the podcast speakers are not the couple "
+    "they are just talking about the couple. script has exactly 2 speakers, with the following format: \"Speaker 0: "
+    "VibeVoice is now available on Fal. Isn't that right, ?\\nSpeaker 1: That's right, and it supports two speakers at once. "
+    "Try it now!\". keep the script to less then 20 lines total."
+)
+
+IMAGE_URL = ResultExtractor('data.images.0.url', 'images.0.url', 'data.url', 'url')
+
+_IMAGE_OPTIONS = {
+    "sync_mode": False,
+    "output_format": "jpeg",
+    "aspect_ratio": "1:1",
+    "num_images": 1,
+}
+
+_EDIT_OPTIONS = dict(_IMAGE_OPTIONS, safety_tolerance='4', enhance_prompt=True)
+
+register_workflow(Workflow(
+    'couplepodcast',
+    'workflows/odtboun/couplepodcast',
+    inputs=[
+        Field('prompt', required=True),
+    ],
+    options={"system_prompt": PODCAST_SYSTEM_PROMPT},
+    outputs={
+        "audio_url": ResultExtractor('audio.url'),
+        "duration": ResultExtractor('duration'),
+    },
+    lane=LONG_RUNNING,
+))
+
+register_workflow(Workflow(
+    'short-couple-video',
+    'workflows/odtboun/short-couple-video',
+    inputs=[
+        Field('concept_description', required=True),
+        Field('image_url_field', required=True),
+        Field('duration', int, default=5),
+    ],
+    outputs={
+        "video_url": ResultExtractor(
+            'video.url', 'video.signed_url',
+            'output.url', 'output.video_url', 'output.0.url', 'output.0.video_url',
+            'result.url', 'result.video_url', 'result.0.url', 'result.0.video_url',
+        ),
+        "content_type": ResultExtractor('video.content_type'),
+        "file_name": ResultExtractor('video.file_name'),
+    },
+    lane=LONG_RUNNING,
+))
+
+register_workflow(Workflow(
+    'short-couple-video-audio',
+    'workflows/odtboun/short-couple-video-audio',
+    inputs=[
+        Field('concept_description', required=True),
+        Field('image_url_field', required=True),
+        Field('duration', int, default=4),
+    ],
+    outputs={
+        "video_url": ResultExtractor('video.url', 'url'),
+    },
+    lane=LONG_RUNNING,
+))
+
+register_workflow(Workflow(
+    'gemini-edit',
+    'fal-ai/gemini-25-flash-image/edit',
+    inputs=[Field('prompt', required=True), Field('image_urls', list, default=[])],
+    options=_EDIT_OPTIONS,
+    outputs={"image_url": IMAGE_URL},
+))
+
+register_workflow(Workflow(
+    'gemini',
+    'fal-ai/gemini-25-flash-image',
+    inputs=[Field('prompt', required=True), Field('image_urls', list, default=[])],
+    options=_EDIT_OPTIONS,
+    outputs={"image_url": IMAGE_URL},
+))
+
+register_workflow(Workflow(
+    'flux-kontext',
+    'fal-ai/flux-pro/kontext',
+    inputs=[Field('prompt', required=True), Field('image_url', required=True)],
+    options=_EDIT_OPTIONS,
+    outputs={"image_url": IMAGE_URL},
+))
+
+register_workflow(Workflow(
+    'flux-kontext-text',
+    'fal-ai/flux-pro/kontext/text-to-image',
+    inputs=[Field('prompt', required=True), Field('image_urls', list, default=[])],
+    options=_EDIT_OPTIONS,
+    outputs={"image_url": IMAGE_URL},
+))
+
+register_workflow(Workflow(
+    'nano-banana',
+    'fal-ai/nano-banana',
+    inputs=[Field('prompt', required=True)],
+    options=_IMAGE_OPTIONS,
+    outputs={"image_url": IMAGE_URL},
+))
@@ -0,0 +1,99 @@
+"""
+Benchmark the incremental streak engine against a full calendar scan.
+
+Run from backend/:  python -m benchmarks.bench_streaks [--couples 200] [--years 3]
+
+Each synthetic couple gets a multi-year history with gaps, backfilled days and
+scheduled (future) days. Both strategies replay the same commits in order and
+read the streak after every commit, which is what the widget feed does.
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+
+from app.streaks import StreakEngine
+
+
+def full_scan_streak(days, today):
+    """Baseline: walk the couple's whole calendar history on every read"""
+    shared = sorted({d for d in days if d <= today})
+    streak = 0
+    expected = None
+    for day in reversed(shared):
+        if expected is None:
+            if day < today - timedelta(days=1):
+                return 0
+        elif day != expected:
+            break
+        streak += 1
+        expected = day - timedelta(days=1)
+    return streak
+
+
+def synthetic_history(rng, years, today):
+    """Commits as (commit_day, share_day) pairs, including backfills and scheduled shares"""
+    start = today - timedelta(days=365 * years)
+    commits = []
+    day = start
+    while day <= today:
+        if rng.random() < 0.85:
+            share_day = day
+            roll = rng.random()
+            if roll < 0.05:
+                share_day = day - timedelta(days=rng.randint(1, 10))   # backfill
+            elif roll < 0.08:
+                share_day = day + timedelta(days=rng.randint(1, 7))    # scheduled
+            commits.append((day, share_day))
+        # Occasional breaks of several days
+        day += timedelta(days=rng.randint(4, 9) if rng.random() < 0.02 else 1)
+    return commits
+
+
+def run_full_scan(histories):
+    results = []
+    started = time.perf_counter()
+    for commits in histories:
+        days = []
+        for commit_day, share_day in commits:
+            days.append(share_day)
+            results.append(full_scan_streak(days, commit_day))
+    return time.perf_counter() - started, results
+
+
+def run_engine(histories):
+    results = []
+    started = time.perf_counter()
+    for commits in histories:
+        engine = StreakEngine()
+        for commit_day, share_day in commits:
+            engine.add_day(share_day)
+            results.append(engine.current_streak(commit_day))
+    return time.perf_counter() - started, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--couples', type=int, default=200)
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    today = date(2026, 1, 1)
+    histories = [synthetic_history(rng, args.years, today) for _ in range(args.couples)]
+    commits = sum(len(h) for h in histories)
+
+    scan_time, scan_results = run_full_scan(histories)
+    engine_time, engine_results = run_engine(histories)
+    if scan_results != engine_results:
+        raise SystemExit("❌ Engine and full-scan streaks disagree")
+
+    print(f"📊 {args.couples} couples x {args.years} years, {commits} commits (read after each)")
+    print(f"🐢 full scan:   {scan_time:.3f}s ({scan_time / commits * 1e6:.1f} µs/commit)")
+    print(f"⚡ incremental: {engine_time:.3f}s ({engine_time / commits * 1e6:.1f} µs/commit)")
+    print(f"🚀 speedup: {scan_time / engine_time:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
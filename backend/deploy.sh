@@ -27,6 +27,7 @@ gcloud run deploy $SERVICE_NAME \
     --port 8080 \
     --memory 512Mi \
     --cpu 1 \
+    --concurrency 80 \
     --max-instances 10 \
     --set-env-vars "GOOGLE_APPLICATION_CREDENTIALS=/app/credentials/service-account-key.json"
 
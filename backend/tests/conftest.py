@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+# Run from anywhere: the backend directory holds the app, benchmarks and tools packages
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import app.supabase_rest as supabase_rest  # noqa: E402
+import app.widget_feed as widget_feed  # noqa: E402
+from app.streaks import StreakEngine  # noqa: E402
+from tests.fake_supabase import NOW, FakeSupabase  # noqa: E402
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    fake = FakeSupabase()
+    monkeypatch.setattr(supabase_rest, 'SUPABASE_URL', 'https://project.supabase.co')
+    monkeypatch.setattr(supabase_rest, 'SUPABASE_ANON_KEY', 'anon')
+    monkeypatch.setattr(supabase_rest, 'PAGE_SIZE', 2)
+    monkeypatch.setattr(supabase_rest.requests, 'get', fake.get)
+    monkeypatch.setattr(widget_feed, '_feeds', {})
+    monkeypatch.setattr(widget_feed, '_authorized', {})
+    monkeypatch.setattr(StreakEngine, 'today', lambda self, now=None: self.local_day(now or NOW))
+    return fake
@@ -0,0 +1,55 @@
+from datetime import datetime, timezone
+
+COUPLE = 'c0ffee00-0000-0000-0000-000000000001'
+TOKEN = 'partner-token'
+# 18:00 on June 1 in Los Angeles, already June 2 in UTC
+NOW = datetime(2026, 6, 2, 1, 0, tzinfo=timezone.utc)
+
+
+class FakeResponse:
+    def __init__(self, status_code, rows=None):
+        self.status_code = status_code
+        self.rows = rows
+
+    def json(self):
+        return self.rows
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSupabase:
+    """Just enough PostgREST for the widget feed: eq/gte/gt filters, created_at order and Range paging"""
+
+    def __init__(self):
+        self.entries = []
+        self.calls = []
+
+    def add(self, day, created_at, **image_data):
+        self.entries.append({"id": len(self.entries), "couple_id": COUPLE, "date": day,
+                             "created_at": created_at, "image_data": image_data})
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        if headers['Authorization'] == 'Bearer expired':
+            return FakeResponse(401)
+        table = url.rsplit('/', 1)[1]
+        self.calls.append((table, dict(params), headers.get('Range')))
+        if table == 'couples':
+            visible = headers['Authorization'] == f'Bearer {TOKEN}' and params['id'] == f'eq.{COUPLE}'
+            return FakeResponse(200, [{"id": COUPLE}] if visible else [])
+
+        rows = [e for e in self.entries if params['couple_id'] == f"eq.{e['couple_id']}"]
+        if 'date' in params:
+            rows = [e for e in rows if e['date'] >= params['date'][len('gte.'):]]
+        if 'created_at' in params:
+            rows = [e for e in rows if e['created_at'] > params['created_at'][len('gt.'):]]
+        rows.sort(key=lambda e: (e['created_at'], e['id']))
+        if headers.get('Range'):
+            first, last = map(int, headers['Range'].split('-'))
+            rows = rows[first:last + 1]
+        columns = params['select'].split(',')
+        return FakeResponse(200, [{c: e[c] for c in columns} for e in rows])
+
+    def entry_queries(self):
+        return [params for table, params, _ in self.calls if table == 'calendar_entries']
@@ -0,0 +1,112 @@
+import asyncio
+import io
+
+import fal_client
+import pytest
+from werkzeug.datastructures import FileStorage
+
+import app.idempotency as idempotency
+from app.asgi import asgi_app
+from app.fal_stub import install_fal_stub
+from tests.fake_supabase import COUPLE, TOKEN
+
+_FAL_ENTRY_POINTS = ('submit', 'run', 'submit_async', 'upload_file', 'upload', 'upload_file_async', 'upload_async')
+
+
+@pytest.fixture(autouse=True)
+def fal_stand_in(tmp_path, monkeypatch):
+    # Restore the real fal client entry points after each test
+    for name in _FAL_ENTRY_POINTS:
+        monkeypatch.setattr(fal_client, name, getattr(fal_client, name))
+    monkeypatch.setenv('FAL_KEY', 'stub')
+    monkeypatch.setenv('VERAMO_FAL_STUB_SPEEDUP', '1000000')
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_DB', str(tmp_path / 'idempotency.sqlite3'))
+    install_fal_stub()
+
+
+def call(method, path, **kwargs):
+    """Serve one request through the ASGI app (with its startup hooks) and return (status, headers, body)"""
+    async def scenario():
+        async with asgi_app.test_app() as test_app:
+            response = await getattr(test_app.test_client(), method)(path, **kwargs)
+            return response.status_code, response.headers, await response.get_data()
+    return asyncio.run(scenario())
+
+
+def image_file(name='photo.jpg'):
+    return FileStorage(io.BytesIO(b'\xff\xd8\xff\xe0 not really a jpeg'), filename=name, content_type='image/jpeg')
+
+
+def test_generate_image_returns_png():
+    status, headers, body = call('post', '/generate-image', form={"description": "a picnic", "style_label": "neutral"},
+                                 files={"images": image_file()})
+    assert status == 200
+    assert headers['Content-Type'] == 'image/png'
+    assert body.startswith(b'\x89PNG')
+
+    status, _, _ = call('post', '/generate-image', form={"description": " "})
+    assert status == 400
+
+
+def test_generate_podcast():
+    status, _, body = call('post', '/generate-podcast', json={"prompt": "our first trip"})
+    assert status == 200
+    assert b'https://stub.fal.local/podcast.mp3' in body
+    assert call('post', '/generate-podcast', json={})[0] == 400
+    assert call('post', '/generate-podcast', json=["not", "an", "object"])[0] == 400
+
+
+def test_generate_short_animation_from_json_and_multipart():
+    status, _, body = call('post', '/generate-short-animation',
+                           json={"description": "dancing", "image_url": "data:image/jpeg;base64,AAAA"})
+    assert status == 200
+    assert b'https://stub.fal.local/video.mp4' in body
+
+    status, _, body = call('post', '/generate-short-animation', form={"description": "dancing"},
+                           files={"image": image_file()})
+    assert status == 200
+    assert b'https://stub.fal.local/video.mp4' in body
+
+    assert call('post', '/generate-short-animation', json={"description": "dancing"})[0] == 400
+    assert call('post', '/generate-short-animation', form={"description": "dancing"})[0] == 400
+
+
+def test_generate_video_with_audio():
+    status, _, body = call('post', '/generate-video-with-audio', form={"description": "sunset", "duration": "5"},
+                           files={"image": image_file()})
+    assert status == 200
+    assert b'https://stub.fal.local/video.mp4' in body
+
+    status, _, body = call('post', '/generate-video-with-audio', json={"description": "sunset"})
+    assert status == 400
+    assert b'Description and image are required' in body
+
+
+def test_generic_workflow():
+    status, _, body = call('post', '/workflows/couplepodcast', json={"prompt": "anniversary"})
+    assert status == 200
+    assert b'https://stub.fal.local/podcast.mp3' in body
+    assert call('post', '/workflows/couplepodcast', json={})[0] == 400
+    assert call('post', '/workflows/nope', json={})[0] == 404
+
+
+def test_health_reports_lanes():
+    status, _, body = call('get', '/health')
+    assert status == 200
+    assert b'"interactive"' in body and b'"long_running"' in body
+
+
+def test_widget_feed_matches_flask(supabase):
+    supabase.add('2026-06-01', '2026-06-01T22:00:00+00:00', thumbnail_url='https://cdn/june1.jpg')
+    auth = {'Authorization': f'Bearer {TOKEN}'}
+    url = f'/widget-feed/{COUPLE}?tz=America/Los_Angeles'
+
+    status, headers, body = call('get', url, headers=auth)
+    assert status == 200
+    assert b'https://cdn/june1.jpg' in body
+    assert headers['Cache-Control'] == 'private, no-cache'
+
+    status, _, body = call('get', url, headers={**auth, 'If-None-Match': headers['ETag']})
+    assert (status, body) == (304, b'')
+    assert call('get', url)[0] == 401
+    assert call('get', f'/widget-feed/{COUPLE}?tz=Mars/Olympus', headers=auth)[0] == 400
@@ -0,0 +1,204 @@
+import asyncio
+import io
+import time
+
+import pytest
+from flask import Flask, jsonify
+from quart import Quart
+
+import app.idempotency as idempotency
+from app.idempotency import (COMPLETED, IN_PROGRESS, MISMATCH, NEW, abandon, begin, claim_or_attach,
+                             complete, heartbeat, idempotent, idempotent_async, lookup, request_fingerprint,
+                             store_key)
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(idempotency, 'IDEMPOTENCY_DB', str(tmp_path / 'idempotency.sqlite3'))
+    monkeypatch.setattr(idempotency, '_last_cleanup', 0.0)
+
+
+def test_begin_complete_replay():
+    state, owner = begin('k', 'fp')
+    assert state == NEW and owner
+    assert begin('k', 'fp') == (IN_PROGRESS, None)
+    complete('k', owner, 200, 'application/json', {"Cache-Control": "no-store"}, b'{"ok":true}')
+    state, record = begin('k', 'fp')
+    assert state == COMPLETED
+    assert record == {"status": 200, "mimetype": "application/json",
+                      "headers": {"Cache-Control": "no-store"}, "body": b'{"ok":true}'}
+
+
+def test_abandon_frees_the_key():
+    _, owner = begin('k', 'fp')
+    abandon('k', owner)
+    assert lookup('k', 'fp') == (None, None)
+    assert begin('k', 'fp')[0] == NEW
+
+
+def test_attach_is_read_only_until_the_key_is_free():
+    _, owner = begin('k', 'fp')
+    assert lookup('k', 'fp') == (IN_PROGRESS, None)
+    assert claim_or_attach('k', 'fp') == (IN_PROGRESS, None)
+    complete('k', owner, 201, 'application/json', {}, b'{}')
+    assert claim_or_attach('k', 'fp')[0] == COMPLETED
+
+
+def test_fingerprint_mismatch():
+    _, owner = begin('k', 'fp')
+    assert begin('k', 'other') == (MISMATCH, None)
+    complete('k', owner, 200, 'application/json', {}, b'{}')
+    assert claim_or_attach('k', 'other') == (MISMATCH, None)
+
+
+def test_stale_claim_is_taken_over_and_the_old_owner_cannot_touch_it(monkeypatch):
+    _, old_owner = begin('k', 'fp')
+    monkeypatch.setattr(idempotency, 'STALE_AFTER', -1)
+    state, new_owner = begin('k', 'fp')
+    assert state == NEW and new_owner != old_owner
+    monkeypatch.setattr(idempotency, 'STALE_AFTER', 60)
+
+    # The original job finishing late neither overwrites nor releases the new claim
+    complete('k', old_owner, 200, 'application/json', {}, b'{"old":true}')
+    abandon('k', old_owner)
+    assert not heartbeat('k', old_owner)
+    assert lookup('k', 'fp') == (IN_PROGRESS, None)
+
+    complete('k', new_owner, 200, 'application/json', {}, b'{"new":true}')
+    assert lookup('k', 'fp')[1]['body'] == b'{"new":true}'
+
+
+def test_heartbeat_keeps_a_running_job_from_going_stale(monkeypatch):
+    monkeypatch.setattr(idempotency, 'STALE_AFTER', 0.3)
+    monkeypatch.setattr(idempotency, 'HEARTBEAT_INTERVAL', 0.05)
+    calls = []
+    app = Flask(__name__)
+
+    @app.route('/generate', methods=['POST'])
+    @idempotent
+    def generate():
+        calls.append(1)
+        time.sleep(0.6)
+        # Still ours after outliving STALE_AFTER twice over
+        assert lookup(store_key('/generate', None, 'abc'), fingerprint)[0] == IN_PROGRESS
+        assert begin(store_key('/generate', None, 'abc'), fingerprint) == (IN_PROGRESS, None)
+        return jsonify({"n": len(calls)})
+
+    client = app.test_client()
+    fingerprint = request_fingerprint('POST', '/generate', {}, {}, {"prompt": "a"}, b'')
+    assert client.post('/generate', json={"prompt": "a"}, headers={'Idempotency-Key': 'abc'}).status_code == 200
+    assert len(calls) == 1
+
+
+def test_image_responses_expire_quickly(monkeypatch):
+    monkeypatch.setattr(idempotency, 'IMAGE_RESPONSE_TTL', -1)
+    _, owner = begin('img', 'fp')
+    complete('img', owner, 200, 'image/png', {}, b'png')
+    _, owner = begin('json', 'fp')
+    complete('json', owner, 200, 'application/json', {}, b'{}')
+    assert lookup('img', 'fp') == (None, None)
+    assert lookup('json', 'fp')[0] == COMPLETED
+
+
+def test_store_caps_evict_oldest_and_skip_oversized_bodies(monkeypatch):
+    monkeypatch.setattr(idempotency, 'MAX_ROWS', 2)
+    monkeypatch.setattr(idempotency, 'MAX_BODY_BYTES', 10)
+    for key in ('a', 'b', 'c'):
+        _, owner = begin(key, 'fp')
+        complete(key, owner, 200, 'application/json', {}, b'{}')
+    assert lookup('a', 'fp') == (None, None)
+    assert lookup('b', 'fp')[0] == lookup('c', 'fp')[0] == COMPLETED
+
+    _, owner = begin('big', 'fp')
+    complete('big', owner, 200, 'application/json', {}, b'x' * 11)
+    assert lookup('big', 'fp') == (None, None)
+
+
+def flask_app(calls, status=200):
+    app = Flask(__name__)
+
+    @app.route('/generate', methods=['POST'])
+    @idempotent
+    def generate():
+        calls.append(1)
+        return jsonify({"n": len(calls)}), status
+
+    return app.test_client()
+
+
+def test_flask_retry_replays_and_scope_ignores_client_address():
+    calls = []
+    client = flask_app(calls)
+    first = client.post('/generate', json={"prompt": "a"}, headers={'Idempotency-Key': 'abc'},
+                        environ_base={'REMOTE_ADDR': '198.51.100.1'})
+    retry = client.post('/generate', json={"prompt": "a"}, headers={'Idempotency-Key': 'abc',
+                        'X-Forwarded-For': '203.0.113.50'}, environ_base={'REMOTE_ADDR': '198.51.100.2'})
+    assert first.get_json() == retry.get_json() == {"n": 1}
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert len(calls) == 1
+
+
+def test_flask_reused_key_with_different_body_is_rejected():
+    calls = []
+    client = flask_app(calls)
+    client.post('/generate', json={"prompt": "a"}, headers={'Idempotency-Key': 'abc'})
+    response = client.post('/generate', json={"prompt": "b"}, headers={'Idempotency-Key': 'abc'})
+    assert response.status_code == 422
+    assert len(calls) == 1
+
+
+def test_flask_multipart_fingerprint_is_stable_across_retries():
+    calls = []
+    client = flask_app(calls)
+    for _ in range(2):
+        response = client.post('/generate', headers={'Idempotency-Key': 'abc'}, data={
+            "description": "a", "images": (io.BytesIO(b'jpeg bytes'), 'ref.jpg')})
+    assert response.headers['Idempotent-Replayed'] == 'true'
+    changed = client.post('/generate', headers={'Idempotency-Key': 'abc'}, data={
+        "description": "a", "images": (io.BytesIO(b'other bytes'), 'ref.jpg')})
+    assert changed.status_code == 422
+
+
+def test_flask_failures_stay_retryable():
+    calls = []
+    client = flask_app(calls, status=500)
+    client.post('/generate', json={}, headers={'Idempotency-Key': 'abc'})
+    client.post('/generate', json={}, headers={'Idempotency-Key': 'abc'})
+    assert len(calls) == 2
+
+
+def test_async_job_survives_client_disconnect():
+    calls = []
+
+    async def scenario():
+        gate = asyncio.Event()
+        app = Quart(__name__)
+
+        @app.route('/generate', methods=['POST'])
+        @idempotent_async
+        async def generate():
+            calls.append(1)
+            await gate.wait()
+            return {"n": len(calls)}
+
+        async with app.test_request_context('/generate', method='POST', json={"prompt": "a"},
+                                            headers={'Idempotency-Key': 'abc'}):
+            handler = asyncio.ensure_future(generate())
+            while not calls:
+                await asyncio.sleep(0.01)
+            # The client disconnects: the server cancels the handler
+            handler.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await handler
+
+        # The retry attaches to the job that is still running
+        client = app.test_client()
+        retry = asyncio.ensure_future(client.post('/generate', json={"prompt": "a"},
+                                                  headers={'Idempotency-Key': 'abc'}))
+        await asyncio.sleep(0.05)
+        gate.set()
+        response = await retry
+        return response.status_code, await response.get_json(), response.headers.get('Idempotent-Replayed')
+
+    assert asyncio.run(scenario()) == (200, {"n": 1}, 'true')
+    assert len(calls) == 1
@@ -0,0 +1,139 @@
+import asyncio
+import threading
+
+import pytest
+from werkzeug.test import EnvironBuilder
+from werkzeug.wrappers import Request
+
+import app.scheduler as scheduler_module
+from app.scheduler import (INTERACTIVE, LONG_RUNNING, TIER_WEIGHTS, AUTHENTICATED, ANONYMOUS,
+                           Lane, Scheduler, SchedulerBusy, requester)
+
+
+def queue_waiters(lane, users, weights=None):
+    """Queue one waiter per user and record the order in which they are woken"""
+    woken = []
+    for i, user in enumerate(users):
+        lane._enqueue(user, lambda i=i, user=user: woken.append((user, i)), (weights or {}).get(user, 1.0))
+    return woken
+
+
+def drain(lane):
+    while lane.active:
+        lane.release()
+
+
+def test_lanes_are_isolated():
+    scheduler = Scheduler([Lane(INTERACTIVE, 2, 4, 1), Lane(LONG_RUNNING, 1, 4, 0.05)])
+    with scheduler.slot(LONG_RUNNING, 'video-user'):
+        with pytest.raises(SchedulerBusy):
+            with scheduler.slot(LONG_RUNNING, 'video-user'):
+                pass
+        # A saturated long-running lane never delays interactive work
+        with scheduler.slot(INTERACTIVE, 'image-user'):
+            with scheduler.slot(INTERACTIVE, 'image-user'):
+                assert scheduler.stats()[INTERACTIVE]['active'] == 2
+    assert scheduler.stats()[LONG_RUNNING] == {"concurrency": 1, "active": 0, "waiting": 0, "max_queue": 4}
+
+
+def test_fair_queuing_interleaves_users():
+    lane = Lane(INTERACTIVE, 1, 16, 1)
+    lane.acquire('first')
+    woken = queue_waiters(lane, ['burst'] * 4 + ['other', 'third'])
+    drain(lane)
+    # One burst request, then everyone else, before the rest of the burst
+    assert [user for user, _ in woken] == ['burst', 'other', 'third', 'burst', 'burst', 'burst']
+    assert [i for user, i in woken if user == 'burst'] == [0, 1, 2, 3]
+
+
+def test_weights_give_a_larger_share():
+    lane = Lane(INTERACTIVE, 1, 16, 1)
+    lane.acquire('first')
+    woken = queue_waiters(lane, ['heavy'] * 4 + ['light'] * 4, weights={'heavy': 2.0})
+    drain(lane)
+    assert [user for user, _ in woken][:6] == ['heavy', 'light', 'heavy', 'heavy', 'light', 'heavy']
+
+
+def test_queue_full_and_timeout_leave_no_waiters():
+    lane = Lane(INTERACTIVE, 1, 1, 0.05)
+    lane.acquire('a')
+    errors = []
+    thread = threading.Thread(target=lambda: errors.append(pytest.raises(SchedulerBusy, lane.acquire, 'b')))
+    thread.start()
+    while not lane.waiting:
+        pass
+    with pytest.raises(SchedulerBusy, match='queue full'):
+        lane.acquire('c')
+    thread.join()
+    assert 'timed out' in str(errors[0].value)
+    assert lane.stats()['waiting'] == 0
+    lane.release()
+    assert lane.stats()['active'] == 0
+    # The timed-out waiter is skipped, so the next caller gets the slot straight away
+    lane.acquire('d')
+    assert lane.stats()['active'] == 1
+
+
+def test_cancelled_async_waiter_does_not_leak_a_slot():
+    async def scenario():
+        lane = Lane(INTERACTIVE, 1, 4, 5)
+        await lane.acquire_async('a')
+        task = asyncio.ensure_future(lane.acquire_async('b'))
+        await asyncio.sleep(0.01)
+        assert lane.waiting == 1
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert lane.waiting == 0
+        lane.release()
+        return lane.stats()
+
+    assert asyncio.run(scenario())['active'] == 0
+
+
+def test_cancel_after_grant_releases_the_slot():
+    async def scenario():
+        lane = Lane(INTERACTIVE, 1, 4, 5)
+        await lane.acquire_async('a')
+        task = asyncio.ensure_future(lane.acquire_async('b'))
+        await asyncio.sleep(0.01)
+        # Granted by release(), but cancelled before the waiter resumed
+        lane.release()
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        else:
+            # wait_for may deliver the grant instead of the cancellation; the caller owns the slot
+            lane.release()
+        return lane.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats['active'] == 0 and stats['waiting'] == 0
+
+
+def make_request(headers, remote_addr='10.0.0.1'):
+    return Request(EnvironBuilder(headers=headers, environ_base={'REMOTE_ADDR': remote_addr}).get_environ())
+
+
+def test_fairness_key_ignores_client_controlled_headers():
+    a = requester(make_request({'X-User-Id': 'someone-else', 'X-Forwarded-For': '1.1.1.1, 203.0.113.7'}))
+    b = requester(make_request({'X-User-Id': 'fresh-id', 'X-Forwarded-For': '2.2.2.2, 203.0.113.7'}))
+    assert a == b == ('ip:203.0.113.7', TIER_WEIGHTS[ANONYMOUS])
+
+
+def test_verified_token_selects_the_user_and_its_weight(monkeypatch):
+    import app.supabase_rest as supabase_rest
+    calls = []
+    monkeypatch.setattr(supabase_rest, 'supabase_configured', lambda: True)
+    monkeypatch.setattr(supabase_rest, 'fetch_user_id',
+                        lambda token: calls.append(token) or ('user-1' if token == 'good' else None))
+    monkeypatch.setattr(scheduler_module, '_verified_tokens', {})
+
+    for _ in range(2):
+        assert requester(make_request({'Authorization': 'Bearer good'})) == ('user:user-1', TIER_WEIGHTS[AUTHENTICATED])
+    assert requester(make_request({'Authorization': 'Bearer forged', 'X-Forwarded-For': '203.0.113.9'})) == \
+        ('ip:203.0.113.9', TIER_WEIGHTS[ANONYMOUS])
+    # Verification results are cached per token
+    assert calls == ['good', 'forged']
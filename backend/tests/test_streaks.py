@@ -0,0 +1,131 @@
+"""
+Timezone behaviour of the streak engine, checked against the full calendar scan
+used as the baseline in benchmarks/bench_streaks.py. The baseline maps every
+share to its local day independently with zoneinfo, using the couple's timezone
+at commit time.
+"""
+import random
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from app.streaks import StreakEngine
+from benchmarks.bench_streaks import full_scan_streak
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def replay(shares, tz_name):
+    """
+    Feed (shared_at, timezone or None) commits to an engine and to the full-scan
+    baseline, reading the streak after every commit as the widget feed does.
+    """
+    engine = StreakEngine(tz_name)
+    current_tz = ZoneInfo(tz_name)
+    days = []
+    for shared_at, new_tz in shares:
+        if new_tz:
+            engine.set_timezone(new_tz)
+            current_tz = ZoneInfo(new_tz)
+        day = engine.add_share(shared_at)
+        expected_day = shared_at.astimezone(current_tz).date()
+        assert day == expected_day
+        days.append(expected_day)
+        assert engine.current_streak(engine.today(shared_at)) == full_scan_streak(days, expected_day)
+    return engine, days
+
+
+def test_share_just_before_and_after_local_midnight():
+    # Istanbul is UTC+3 all year: 20:59 UTC is still today, 21:00 UTC is tomorrow
+    engine = StreakEngine('Europe/Istanbul')
+    assert engine.add_share(utc(2026, 5, 1, 20, 59)).isoformat() == '2026-05-01'
+    assert engine.add_share(utc(2026, 5, 1, 21, 0)).isoformat() == '2026-05-02'
+    assert engine.current_streak(engine.today(utc(2026, 5, 1, 21, 30))) == 2
+    # In UTC both shares are on the same day
+    utc_engine = StreakEngine('UTC')
+    utc_engine.add_share(utc(2026, 5, 1, 20, 59))
+    utc_engine.add_share(utc(2026, 5, 1, 21, 0))
+    assert len(utc_engine) == 1
+
+
+def test_streak_survives_until_local_midnight_then_breaks():
+    engine = StreakEngine('Asia/Tokyo')
+    engine.add_share(utc(2026, 5, 1, 3, 0))     # 12:00 on May 1 in Tokyo
+    # 23:59 on May 2 local: yesterday's share keeps the streak alive
+    assert engine.current_streak(engine.today(utc(2026, 5, 2, 14, 59))) == 1
+    # 00:00 on May 3 local: the streak is broken
+    assert engine.current_streak(engine.today(utc(2026, 5, 2, 15, 0))) == 0
+
+
+@pytest.mark.parametrize('tz_name, start', [
+    ('America/New_York', datetime(2026, 3, 5)),     # spring forward on March 8
+    ('America/New_York', datetime(2026, 10, 29)),   # fall back on November 1
+    ('Europe/London', datetime(2026, 3, 26)),       # spring forward on March 29
+    ('Australia/Sydney', datetime(2026, 4, 2)),     # fall back on April 5
+])
+def test_daily_late_night_shares_across_dst_change(tz_name, start):
+    tz = ZoneInfo(tz_name)
+    shares = []
+    for offset in range(8):
+        # 23:30 local every night, and 00:30 local the morning after
+        local = (start + timedelta(days=offset)).replace(hour=23, minute=30, tzinfo=tz)
+        shares.append((local.astimezone(timezone.utc), None))
+        morning = (start + timedelta(days=offset + 1)).replace(hour=0, minute=30, tzinfo=tz)
+        shares.append((morning.astimezone(timezone.utc), None))
+
+    engine, days = replay(shares, tz_name)
+    assert len(engine) == 9
+    assert engine.current_streak(days[-1]) == 9
+
+
+def test_share_in_repeated_hour_of_fall_back_counts_once():
+    tz = ZoneInfo('America/New_York')
+    first = datetime(2026, 11, 1, 1, 30, tzinfo=tz, fold=0).astimezone(timezone.utc)
+    second = datetime(2026, 11, 1, 1, 30, tzinfo=tz, fold=1).astimezone(timezone.utc)
+    assert second - first == timedelta(hours=1)
+
+    engine, days = replay([(first, None), (second, None)], 'America/New_York')
+    assert days[0] == days[1]
+    assert len(engine) == 1
+
+
+def test_timezone_change_applies_to_later_shares_only():
+    shares = [
+        (utc(2026, 6, 1, 6, 0), None),                  # May 31, 23:00 in Los Angeles
+        (utc(2026, 6, 2, 6, 0), None),                  # June 1 in Los Angeles
+        (utc(2026, 6, 2, 16, 0), 'Asia/Tokyo'),         # June 3, 01:00 in Tokyo
+        (utc(2026, 6, 3, 16, 0), None),                 # June 4 in Tokyo
+    ]
+    engine, days = replay(shares, 'America/Los_Angeles')
+    assert [d.isoformat() for d in days] == ['2026-05-31', '2026-06-01', '2026-06-03', '2026-06-04']
+    # Moving east skipped June 2, so the streak restarted
+    assert engine.current_streak(days[-1]) == 2
+    assert engine.longest == 2
+
+
+def test_timezone_change_westwards_can_land_on_an_already_shared_day():
+    shares = [
+        (utc(2026, 6, 1, 16, 0), None),                     # June 2, 01:00 in Tokyo
+        (utc(2026, 6, 2, 6, 0), 'America/Los_Angeles'),     # June 1, 23:00 in Los Angeles
+        (utc(2026, 6, 2, 20, 0), None),                     # June 2 in Los Angeles
+    ]
+    engine, days = replay(shares, 'Asia/Tokyo')
+    assert [d.isoformat() for d in days] == ['2026-06-02', '2026-06-01', '2026-06-02']
+    assert len(engine) == 2
+    assert engine.current_streak(days[-1]) == 2
+
+
+def test_random_shares_with_timezone_moves_match_full_scan():
+    rng = random.Random(11)
+    zones = ['UTC', 'Pacific/Kiritimati', 'Pacific/Pago_Pago', 'America/New_York',
+             'Europe/Istanbul', 'Australia/Lord_Howe', 'Asia/Kathmandu']
+    moment = utc(2025, 1, 1)
+    shares = []
+    for _ in range(2000):
+        moment += timedelta(minutes=rng.randint(60, 2 * 24 * 60))
+        new_tz = rng.choice(zones) if rng.random() < 0.03 else None
+        shares.append((moment, new_tz))
+    replay(shares, 'UTC')
@@ -0,0 +1,58 @@
+from flask import Flask, jsonify, send_file
+
+import app.tracing as tracing
+from app.tracing import TraceWriter
+from tools.replay_trace import load_trace
+
+
+def test_writer_batches_round_trip_through_load_trace(tmp_path):
+    path = str(tmp_path / 'trace.jsonl.gz')
+    for process_offset in (0.0, 0.5):
+        # Two processes appending to the same file, each with its own writer
+        writer = TraceWriter(path, flush_interval=60)
+        writer.start()
+        for i in range(3):
+            writer.submit({"p": "/generate-image", "epoch": 1_700_000_100.0 + i + process_offset})
+        writer.close()
+
+    records = load_trace(path)
+    assert [r['t'] for r in records] == [0.0, 0.5, 1.0, 1.5, 2.0, 2.5]
+
+
+def test_load_trace_accepts_traces_without_epoch(tmp_path):
+    path = tmp_path / 'old.jsonl'
+    path.write_text('{"p":"/generate-podcast","t":7.5}\n{"p":"/generate-podcast","t":5.0}\n')
+    assert [r['t'] for r in load_trace(str(path))] == [0.0, 2.5]
+
+
+class CollectingWriter:
+    def __init__(self):
+        self.records = []
+
+    def submit(self, record):
+        self.records.append(record)
+
+
+def test_flask_hooks_record_file_sizes_and_skip_replays(tmp_path, monkeypatch):
+    writer = CollectingWriter()
+    monkeypatch.setattr(tracing, 'TRACE_FILE', str(tmp_path / 'trace.jsonl'))
+    monkeypatch.setattr(tracing, 'trace_writer', lambda: writer)
+    png = tmp_path / 'out.png'
+    png.write_bytes(b'\x89PNG' + b'\0' * 96)
+
+    app = Flask(__name__)
+    tracing.init_flask_tracing(app)
+
+    @app.route('/generate-image', methods=['POST'])
+    def generate_image():
+        return send_file(str(png), mimetype='image/png')
+
+    @app.route('/generate-podcast', methods=['POST'])
+    def generate_podcast():
+        return jsonify({"audio_url": "u"}), 200, {'Idempotent-Replayed': 'true'}
+
+    client = app.test_client()
+    client.post('/generate-image', data={"description": "a picnic"})
+    client.post('/generate-podcast', json={"prompt": "hi"})
+
+    assert [(r['p'], r['status'], r['resp_bytes']) for r in writer.records] == [('/generate-image', 200, 100)]
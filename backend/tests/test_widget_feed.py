@@ -0,0 +1,100 @@
+import pytest
+
+import app.supabase_rest as supabase_rest
+import app.widget_feed as widget_feed
+from app.main import app
+from tests.fake_supabase import COUPLE, TOKEN
+
+
+@pytest.fixture
+def client():
+    return app.test_client()
+
+
+def get_feed(client, tz='America/Los_Angeles', token=TOKEN, **headers):
+    query = f'?tz={tz}' if tz else ''
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    return client.get(f'/widget-feed/{COUPLE}{query}', headers=headers)
+
+
+def test_requires_configuration_and_a_partner_token(client, supabase, monkeypatch):
+    assert get_feed(client, token=None).status_code == 401
+    assert get_feed(client, token='expired').status_code == 401
+    assert get_feed(client, token='someone-else').status_code == 404
+    assert client.post(f'/widget-feed/{COUPLE}/shares', json={"thumbnail_url": "u"},
+                       headers={'Authorization': 'Bearer someone-else'}).status_code == 404
+    monkeypatch.setattr(supabase_rest, 'SUPABASE_ANON_KEY', '')
+    assert get_feed(client).status_code == 503
+
+
+def test_hydrates_long_history_page_by_page(client, supabase):
+    # Ten consecutive days ending today in Los Angeles, more than one page
+    for day in range(23, 32):
+        supabase.add(f'2026-05-{day}', f'2026-05-{day}T20:00:00+00:00')
+    supabase.add('2026-06-01', '2026-06-01T20:00:00+00:00', thumbnail_url='https://cdn/today.jpg',
+                 storage_path='couples/today.jpg')
+
+    body = get_feed(client).get_json()
+    assert body['date'] == '2026-06-01'
+    assert body['streak'] == 10
+    assert body['thumbnail_url'] == 'https://cdn/today.jpg'
+    assert body['storage_path'] == 'couples/today.jpg'
+
+    history, recent = [c for c in supabase.calls if c[0] == 'calendar_entries' and c[2] == '0-1'][:2]
+    assert history[1]['select'] == 'date,created_at'
+    # Image data is only fetched from yesterday on
+    assert 'image_data' in recent[1]['select'] and recent[1]['date'] == 'gte.2026-05-31'
+    assert len([c for c in supabase.calls if 'date' not in c[1] and c[0] == 'calendar_entries']) == 6
+
+
+def test_timezone_decides_today(client, supabase):
+    supabase.add('2026-06-01', '2026-06-01T22:00:00+00:00', thumbnail_url='https://cdn/june1.jpg')
+
+    body = get_feed(client).get_json()
+    assert (body['date'], body['thumbnail_url'], body['streak']) == ('2026-06-01', 'https://cdn/june1.jpg', 1)
+    # Without the couple's timezone the day has already rolled over in UTC
+    widget_feed._feeds.clear()
+    body = get_feed(client, tz=None).get_json()
+    assert (body['date'], body['thumbnail_url'], body['streak']) == ('2026-06-02', None, 1)
+    # A later request with the timezone corrects the cached state
+    body = get_feed(client).get_json()
+    assert (body['date'], body['thumbnail_url']) == ('2026-06-01', 'https://cdn/june1.jpg')
+    assert get_feed(client, tz='Mars/Olympus').status_code == 400
+
+
+def test_etag_revalidation(client, supabase):
+    supabase.add('2026-06-01', '2026-06-01T22:00:00+00:00', thumbnail_url='https://cdn/june1.jpg')
+    first = get_feed(client)
+    etag = first.headers['ETag']
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}'):
+        response = get_feed(client, **{'If-None-Match': if_none_match})
+        assert response.status_code == 304
+        assert response.data == b''
+    assert get_feed(client, **{'If-None-Match': '"other"'}).status_code == 200
+
+
+def test_refresh_only_pulls_new_entries(client, supabase, monkeypatch):
+    supabase.add('2026-05-31', '2026-05-31T22:00:00+00:00')
+    assert get_feed(client).get_json()['streak'] == 1
+
+    supabase.add('2026-06-01', '2026-06-01T22:00:00+00:00', thumbnail_url='https://cdn/june1.jpg')
+    monkeypatch.setattr(widget_feed, 'REFRESH_AFTER', 0)
+    supabase.calls.clear()
+    body = get_feed(client).get_json()
+    assert (body['streak'], body['thumbnail_url']) == (2, 'https://cdn/june1.jpg')
+    queries = supabase.entry_queries()
+    assert queries and all(q['created_at'] == 'gt.2026-05-31T22:00:00+00:00' for q in queries)
+
+
+def test_share_commit_validates_types(client, supabase):
+    headers = {'Authorization': f'Bearer {TOKEN}'}
+    url = f'/widget-feed/{COUPLE}/shares'
+    for body in ([1], {"thumbnail_url": 5}, {"thumbnail_url": "u", "timezone": 3},
+                 {"thumbnail_url": "u", "timezone": "Nope/Nowhere"}, {"thumbnail_url": "u", "date": "June"}):
+        assert client.post(url, json=body, headers=headers).status_code == 400
+
+    response = client.post(url, json={"thumbnail_url": "https://cdn/new.jpg", "date": "2026-06-01",
+                                      "timezone": "America/Los_Angeles"}, headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()['thumbnail_url'] == 'https://cdn/new.jpg'
@@ -0,0 +1,278 @@
+"""
+Replay recorded production request shapes against a local Veramo backend.
+
+Record traces by running the service with VERAMO_TRACE_FILE=trace.jsonl.gz, then
+start the build under test with the fal stand-in (VERAMO_FAL_STUB=1, optionally
+VERAMO_FAL_STUB_SPEEDUP to match --speedup) and run from backend/:
+
+    python tools/replay_trace.py replay trace.jsonl.gz --base-url http://localhost:8080 \\
+        --speedup 10 --out build_a.json
+    python tools/replay_trace.py compare build_a.json build_b.json
+
+Requests are synthesized from the recorded shapes (prompt length, reference count,
+image dimensions and byte sizes, style label, duration) and sent at the recorded
+arrival times divided by the speedup. Arrival times are the records' wall-clock
+"epoch", normalized to the first record, so traces merged from several processes
+share one timeline. Latency is measured from each request's scheduled send time,
+not from when a worker picked it up, so client-side queueing behind
+--concurrency counts against the build instead of hiding slow responses
+(coordinated omission). Memory is sampled from /debug/stats, which the service
+exposes only in fal stand-in mode.
+"""
+import argparse
+import base64
+import gzip
+import io
+import json
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from PIL import Image
+
+
+def arrival_time(record):
+    # Older traces only carry "t", seconds since their process started
+    return record.get('epoch', record.get('t', 0))
+
+
+def load_trace(path):
+    """Records ordered by arrival, with "t" rewritten as seconds since the first arrival"""
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt') as f:
+        records = sorted((json.loads(line) for line in f if line.strip()), key=arrival_time)
+    if records:
+        t0 = arrival_time(records[0])
+        for record in records:
+            record['t'] = arrival_time(record) - t0
+    return records
+
+
+_image_cache = {}
+
+
+def synthetic_image(size, width, height):
+    """JPEG bytes with the recorded dimensions, padded to the recorded byte size"""
+    key = (size, width, height)
+    if key not in _image_cache:
+        img = Image.new('RGB', (width or 1024, height or 1024), (180, 140, 120))
+        buffer = io.BytesIO()
+        img.save(buffer, 'JPEG', quality=90)
+        data = buffer.getvalue()
+        # JPEG decoders ignore trailing bytes, so padding keeps the upload size realistic
+        if size and size > len(data):
+            data += b'\0' * (size - len(data))
+        _image_cache[key] = data
+    return _image_cache[key]
+
+
+def synthetic_prompt(length):
+    words = "a couple walking by the sea at golden hour with a dog "
+    return (words * (length // len(words) + 1))[:length] or "a couple"
+
+
+def build_request(record):
+    """Return (path, requests kwargs) reproducing a recorded request shape"""
+    path = record['p']
+    prompt = synthetic_prompt(record.get('prompt_len', 0))
+    images = [synthetic_image(*shape) for shape in record.get('images', [])]
+    duration = record.get('duration')
+
+    if path == '/generate-podcast':
+        return path, {"json": {"prompt": prompt}}
+
+    if path == '/generate-image':
+        form = {"description": prompt, "style_label": record.get('style') or 'neutral'}
+        files = [('images', (f'ref{i}.jpg', data, 'image/jpeg')) for i, data in enumerate(images)]
+        return path, {"data": form, "files": files}
+
+    # Video workflows take one image, either uploaded or as an image_url
+    fields = {"description": prompt}
+    if duration is not None:
+        fields["duration"] = duration
+    if record.get('ct') == 'multipart' and images:
+        return path, {"data": fields, "files": [('image', ('ref.jpg', images[0], 'image/jpeg'))]}
+    data_uri = 'data:image/jpeg;base64,' + base64.b64encode(images[0] if images else synthetic_image(0, 512, 512)).decode()
+    fields["image_url"] = data_uri
+    return path, {"json": fields}
+
+
+class MemorySampler(threading.Thread):
+    def __init__(self, base_url, interval=0.5):
+        super().__init__(daemon=True)
+        self.url = base_url.rstrip('/') + '/debug/stats'
+        self.interval = interval
+        self.samples = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.is_set():
+            try:
+                self.samples.append(requests.get(self.url, timeout=2).json())
+            except Exception:
+                pass
+            self.stopped.wait(self.interval)
+
+    def summary(self):
+        rss = [s['rss_kb'] for s in self.samples if s.get('rss_kb')]
+        peaks = [s['max_rss_kb'] for s in self.samples if s.get('max_rss_kb')]
+        return {
+            "samples": len(self.samples),
+            "rss_kb_mean": round(statistics.mean(rss)) if rss else None,
+            "rss_kb_peak": max(rss) if rss else None,
+            "max_rss_kb": max(peaks) if peaks else None,
+        }
+
+
+def _percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(pct / 100 * (len(values) - 1))))
+    return round(values[index], 1)
+
+
+def summarize(results):
+    by_path = {}
+    for path, status, ms in results:
+        by_path.setdefault(path, []).append((status, ms))
+    by_path['*'] = [(status, ms) for _, status, ms in results]
+
+    summary = {}
+    for path, rows in sorted(by_path.items()):
+        latencies = [ms for _, ms in rows]
+        summary[path] = {
+            "count": len(rows),
+            "errors": sum(1 for status, _ in rows if status is None or status >= 400),
+            "mean_ms": round(statistics.mean(latencies), 1) if latencies else None,
+            "p50_ms": _percentile(latencies, 50),
+            "p95_ms": _percentile(latencies, 95),
+            "p99_ms": _percentile(latencies, 99),
+        }
+    return summary
+
+
+def replay(args):
+    records = load_trace(args.trace)
+    if args.limit:
+        records = records[:args.limit]
+    if not records:
+        sys.exit("❌ Trace is empty")
+
+    base_url = args.base_url.rstrip('/')
+    # One pooled connection per worker; the default pool of 10 would serialize the rest
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_maxsize=args.concurrency)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    results = []
+    results_lock = threading.Lock()
+
+    def send(record, scheduled):
+        path, kwargs = build_request(record)
+        try:
+            status = session.post(base_url + path, timeout=args.timeout, **kwargs).status_code
+        except Exception as e:
+            print(f"❌ {path} failed: {e}")
+            status = None
+        # Measured from the scheduled send time, including any wait for a free worker
+        with results_lock:
+            results.append((path, status, (time.perf_counter() - scheduled) * 1000))
+
+    sampler = MemorySampler(base_url)
+    sampler.start()
+    print(f"▶️ Replaying {len(records)} requests against {base_url} at {args.speedup}x")
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for record in records:
+            scheduled = wall_start + record['t'] / args.speedup
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, record, scheduled)
+    elapsed = time.perf_counter() - wall_start
+    sampler.stopped.set()
+    sampler.join()
+
+    report = {
+        "label": args.label or base_url,
+        "trace": args.trace,
+        "speedup": args.speedup,
+        "elapsed_s": round(elapsed, 2),
+        "latency": summarize(results),
+        "memory": sampler.summary(),
+    }
+    print_report(report)
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.out}")
+
+
+def print_report(report):
+    print(f"📊 {report['label']} ({report['elapsed_s']}s)")
+    for path, row in report['latency'].items():
+        print(f"  {path:<28} n={row['count']:<5} err={row['errors']:<4} "
+              f"p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms")
+    memory = report['memory']
+    print(f"  memory: mean rss={memory['rss_kb_mean']}KB peak rss={memory['rss_kb_peak']}KB max_rss={memory['max_rss_kb']}KB")
+
+
+def _delta(a, b):
+    if a is None or b is None:
+        return "n/a"
+    if not a:
+        return f"{b - a:+}"
+    return f"{b - a:+.1f} ({(b - a) / a * 100:+.1f}%)"
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        base = json.load(f)
+    with open(args.candidate) as f:
+        cand = json.load(f)
+
+    print(f"🔍 {base['label']}  ->  {cand['label']}")
+    for path in sorted(set(base['latency']) | set(cand['latency'])):
+        a = base['latency'].get(path, {})
+        b = cand['latency'].get(path, {})
+        print(f"  {path}")
+        for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'errors'):
+            print(f"    {metric:<7} {a.get(metric)} -> {b.get(metric)}  {_delta(a.get(metric), b.get(metric))}")
+    for metric in ('rss_kb_mean', 'rss_kb_peak', 'max_rss_kb'):
+        a = base['memory'].get(metric)
+        b = cand['memory'].get(metric)
+        print(f"  memory {metric:<12} {a} -> {b}  {_delta(a, b)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay recorded request traces and compare builds")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    replay_parser = subparsers.add_parser('replay', help="Drive a trace against a running instance")
+    replay_parser.add_argument('trace')
+    replay_parser.add_argument('--base-url', default='http://localhost:8080')
+    replay_parser.add_argument('--speedup', type=float, default=1.0)
+    replay_parser.add_argument('--concurrency', type=int, default=256,
+                               help="Max in-flight requests; queueing beyond it is included in latency")
+    replay_parser.add_argument('--timeout', type=float, default=600)
+    replay_parser.add_argument('--limit', type=int, default=0)
+    replay_parser.add_argument('--label')
+    replay_parser.add_argument('--out')
+    replay_parser.set_defaults(func=replay)
+
+    compare_parser = subparsers.add_parser('compare', help="Diff two replay reports")
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('candidate')
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()